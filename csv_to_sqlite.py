@@ -4,156 +4,503 @@ Convert CSV files to SQLite database with full-text search capabilities for NLP
 Preserves ALL columns from both CSV files without any data loss.
 """
 
+import argparse
+import csv
+import hashlib
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+from pyarrow import csv as pa_csv
 import sqlite3
-from sqlite_utils import Database
 import os
 import sys
 import re
+import queue
+import threading
 
-def clean_column_name(col_name):
-    """Clean column names for SQLite compatibility while preserving readability."""
-    # Replace problematic characters but keep the name readable
-    cleaned = str(col_name).strip()
-    # Replace spaces and special chars with underscores
-    cleaned = re.sub(r'[^\w\-]', '_', cleaned)
-    # Remove multiple consecutive underscores
-    cleaned = re.sub(r'_+', '_', cleaned)
-    # Remove leading/trailing underscores
-    cleaned = cleaned.strip('_')
-    # Ensure it doesn't start with a number
-    if cleaned and cleaned[0].isdigit():
-        cleaned = 'col_' + cleaned
-    return cleaned if cleaned else 'unnamed_column'
-
-def setup_database():
-    """Create SQLite database from CSV files with FTS support."""
-    
-    # Read CSV files with all columns preserved
-    print("Reading CSV files...")
-    print("Loading josys-devices.csv...")
-    devices_df = pd.read_csv('josys-devices.csv', dtype=str, na_filter=False)
-    print(f"Devices CSV: {len(devices_df)} rows, {len(devices_df.columns)} columns")
-    print("Device columns:", list(devices_df.columns))
-    
-    print("\nLoading josys-provisions.csv...")
-    provisions_df = pd.read_csv('josys-provisions.csv', dtype=str, na_filter=False)
-    print(f"Provisions CSV: {len(provisions_df)} rows, {len(provisions_df.columns)} columns")
-    print("Provision columns:", list(provisions_df.columns))
-    
-    print("\nLoading josys-app-portfolio.csv...")
-    portfolio_df = pd.read_csv('josys-app-portfolio.csv', dtype=str, na_filter=False)
-    print(f"Portfolio CSV: {len(portfolio_df)} rows, {len(portfolio_df.columns)} columns")
-    print("Portfolio columns:", list(portfolio_df.columns))
+# Arrow parses each CSV in blocks of this many bytes, so only one block of rows
+# is held in memory at a time while it is streamed into SQLite.
+CSV_BLOCK_SIZE = 8 << 20
+
+# Files up to this size are parsed whole by Arrow's multithreaded reader, split
+# into smaller blocks so every core gets work; larger files are streamed.
+PARALLEL_READ_MAX_BYTES = 256 << 20
+PARALLEL_READ_BLOCK_SIZE = 1 << 20
+
+# Rows per batch when a ragged CSV has to be parsed with the csv module
+PADDED_BATCH_ROWS = 10_000
+
+# Converted batches the row-conversion thread may hold ahead of the inserts
+ROW_PREFETCH_BATCHES = 2
+
+# Column-name cleaning patterns, compiled once rather than looked up per call
+_RE_NONWORD = re.compile(r'[^\w\-]')
+_RE_MULTI_UNDER = re.compile(r'_+')
+_RE_LEADING_DIGIT = re.compile(r'\d')
+
+# Keywords that mark a column as searchable text, matched against the
+# underscore-separated tokens of each cleaned column name
+DEVICE_FTS_KEYWORDS = frozenset({
+    'asset', 'device', 'type', 'manufacturer', 'model', 'system',
+    'information', 'email', 'city', 'region', 'status', 'vendor'
+})
+PROVISION_FTS_KEYWORDS = frozenset({
+    'first', 'last', 'name', 'user', 'email', 'username',
+    'role', 'status', 'location'
+})
+PORTFOLIO_FTS_KEYWORDS = frozenset({
+    'app', 'identifier', 'role', 'first', 'last', 'name', 'email',
+    'status', 'category', 'department', 'title', 'additional'
+})
+
+# View column lookups: name -> (predicate on the lower-cased column, fallback name)
+DEVICE_VIEW_COLUMNS = {
+    'asset_number': (lambda c: 'asset' in c and 'number' in c, 'Asset_Number'),
+    'device_type': (lambda c: 'device' in c and 'type' in c, 'Device_Type'),
+    'device_status': (lambda c: 'device' in c and 'status' in c, 'Device_Status'),
+    'manufacturer': (lambda c: 'manufacturer' in c, 'Manufacturer'),
+    'model_name': (lambda c: 'model' in c and 'name' in c, 'Model_Name'),
+    'assigned_email': (lambda c: 'assigned' in c and 'email' in c, 'Assigned_User_s_Email'),
+    'city': (lambda c: 'city' in c, 'City'),
+    'region': (lambda c: 'region' in c, 'Region'),
+    'additional_info': (lambda c: 'additional' in c and 'information' in c, 'Additional_Information'),
+}
+PROVISION_VIEW_COLUMNS = {
+    'user_id': (lambda c: 'user' in c and 'id' in c, 'User_ID'),
+    'first_name': (lambda c: 'first' in c and 'name' in c, 'First_Name'),
+    'last_name': (lambda c: 'last' in c and 'name' in c, 'Last_Name'),
+    'email': (lambda c: c == 'email', 'Email'),
+    'status': (lambda c: c == 'status', 'Status'),
+    'role': (lambda c: c == 'role', 'Role'),
+    'work_location': (lambda c: 'work' in c and 'location' in c, 'Work_Location_Code'),
+}
+PORTFOLIO_VIEW_COLUMNS = {
+    'app': (lambda c: c == 'app', 'App'),
+    'identifier': (lambda c: 'identifier' in c, 'Identifier'),
+    'id': (lambda c: c == 'id', 'ID'),
+    'account_status': (lambda c: 'account' in c and 'status' in c, 'Account_Status'),
+    # "Role(s)" is cleaned to Role_s, as opposed to the single "Role" column
+    'roles': (lambda c: c.startswith('role_'), 'Role_s'),
+    'email': (lambda c: c == 'email', 'Email'),
+    'user_id': (lambda c: 'user' in c and 'id' in c, 'User_ID'),
+}
+
+# Trigram tokenization lets FTS5 answer substring matches (LIKE '%thinkp%')
+# from the index; it needs SQLite 3.34+, older builds keep whole-word tokens.
+FTS_TOKENIZER = 'trigram' if sqlite3.sqlite_version_info >= (3, 34, 0) else 'unicode61'
+
+# The database is rebuilt from scratch on every run, so durability is pointless
+# while loading: no rollback journal, no fsync, sorts and temp b-trees in memory.
+BULK_LOAD_PRAGMAS = """
+    PRAGMA journal_mode=OFF;
+    PRAGMA synchronous=OFF;
+    PRAGMA temp_store=MEMORY;
+    PRAGMA locking_mode=EXCLUSIVE;
+    PRAGMA cache_size=-262144;
+"""
+
+# Settings the finished database is left in for the NLP service to read from.
+# The service only ever reads, and a rollback-journal database can be opened
+# read-only without the -shm file WAL needs, so it also works from a read-only mount.
+SERVING_PRAGMAS = """
+    PRAGMA locking_mode=NORMAL;
+    PRAGMA journal_mode=DELETE;
+    PRAGMA synchronous=NORMAL;
+"""
+
+# Indexes for the NLP service's email joins and the filters shared by its
+# cross-reference queries; built here since the service opens the database read-only.
+QUERY_INDEXES = """
+    CREATE INDEX IF NOT EXISTS idx_devices_email ON devices(Assigned_User_s_Email);
+    CREATE INDEX IF NOT EXISTS idx_provisions_email ON provisions(Email);
+    CREATE INDEX IF NOT EXISTS idx_app_portfolio_email_app ON app_portfolio(Email, App);
+    CREATE INDEX IF NOT EXISTS idx_provisions_email_notion
+        ON provisions(Email, `Notion_-_Josys_inc`, `Notion_-_Josys_public`);
+    CREATE INDEX IF NOT EXISTS idx_provisions_first_name_lower ON provisions(LOWER(First_Name));
+    CREATE INDEX IF NOT EXISTS idx_provisions_email_suffix ON provisions(LOWER(substr(Email, -3)));
+    CREATE INDEX IF NOT EXISTS idx_devices_manufacturer_status_email
+        ON devices(UPPER(Manufacturer), Device_Status, Assigned_User_s_Email);
+    CREATE INDEX IF NOT EXISTS idx_app_portfolio_status_email_app_role
+        ON app_portfolio(Account_Status, Email, App, Role_s);
+    CREATE INDEX IF NOT EXISTS idx_app_portfolio_aws_admins ON app_portfolio(Account_Status, Email)
+        WHERE UPPER(App) LIKE '%AWS%' AND UPPER(Role_s) LIKE '%ADMINISTRATOR%';
+"""
+
+def clean_column_names(columns):
+    """Clean column names for SQLite compatibility while preserving readability.
+
+    Works on the whole header at once: whitespace is stripped with numpy.char,
+    and the regex steps go through pandas' vectorized string methods.
+    """
+    stripped = np.char.strip(np.asarray(columns, dtype=str))
+    cleaned = (
+        pd.Index(stripped)
+        # Replace spaces and special chars with underscores
+        .str.replace(_RE_NONWORD, '_', regex=True)
+        # Remove multiple consecutive underscores
+        .str.replace(_RE_MULTI_UNDER, '_', regex=True)
+        # Remove leading/trailing underscores
+        .str.strip('_')
+    )
+    # Ensure names don't start with a number
+    cleaned = cleaned.where(~cleaned.str.match(_RE_LEADING_DIGIT), 'col_' + cleaned)
+    return cleaned.where(cleaned != '', 'unnamed_column').tolist()
+
+def select_fts_columns(columns, keywords):
+    """Pick the columns whose name tokens intersect the given keyword set."""
+    return [col for col in columns if not keywords.isdisjoint(col.lower().split('_'))]
+
+def resolve_view_columns(columns, lookups):
+    """Resolve each view column to the first matching table column in one pass over the columns."""
+    resolved = {}
+    for col in columns:
+        col_lower = col.lower()
+        for key, (matches, _) in lookups.items():
+            if key not in resolved and matches(col_lower):
+                resolved[key] = col
+    return {key: resolved.get(key, default) for key, (_, default) in lookups.items()}
+
+def read_csv_header(csv_path):
+    """Read only the header row of a CSV file."""
+    with open(csv_path, newline='', encoding='utf-8') as f:
+        return next(csv.reader(f))
+
+def stream_csv_batches(csv_path, columns):
+    """Read a CSV file as Arrow record batches, typing every column as a string.
+
+    The header row is skipped and replaced by the already-cleaned ``columns`` so the
+    batches come out keyed by their final SQLite column names. Arrow's streaming
+    reader is single-threaded, so files small enough to hold in memory are parsed
+    in parallel with ``read_csv`` instead.
+    """
+    # Quoted values can span lines (e.g. multi-line Additional Information)
+    parse_options = pa_csv.ParseOptions(newlines_in_values=True)
+    convert_options = pa_csv.ConvertOptions(
+        column_types={col: pa.string() for col in columns},
+        strings_can_be_null=False
+    )
+    if os.path.getsize(csv_path) <= PARALLEL_READ_MAX_BYTES:
+        read_options = pa_csv.ReadOptions(
+            block_size=PARALLEL_READ_BLOCK_SIZE, column_names=columns, skip_rows=1, use_threads=True
+        )
+        try:
+            table = pa_csv.read_csv(csv_path, read_options=read_options, parse_options=parse_options,
+                                    convert_options=convert_options)
+        except pa.ArrowInvalid as e:
+            print(f"  ⚠ {csv_path}: {e} - retrying with the csv module, which pads short rows")
+            return list(read_padded_csv_batches(csv_path, columns))
+        return table.to_batches()
+    read_options = pa_csv.ReadOptions(block_size=CSV_BLOCK_SIZE, column_names=columns, skip_rows=1)
+    try:
+        reader = pa_csv.open_csv(csv_path, read_options=read_options, parse_options=parse_options,
+                                 convert_options=convert_options)
+    except pa.ArrowInvalid as e:
+        print(f"  ⚠ {csv_path}: {e} - retrying with the csv module, which pads short rows")
+        return read_padded_csv_batches(csv_path, columns)
+    return iter_streamed_batches(reader, csv_path, columns)
+
+def iter_streamed_batches(reader, csv_path, columns):
+    """Yield an Arrow streaming reader's batches, switching to the csv module at a ragged block.
+
+    Arrow only hands out fully parsed blocks, so the csv module skips the rows
+    already yielded and carries on from the first row of the block that failed.
+    """
+    loaded = 0
+    try:
+        for batch in reader:
+            yield batch
+            loaded += batch.num_rows
+    except pa.ArrowInvalid as e:
+        print(f"  ⚠ {csv_path}: {e} - retrying with the csv module, which pads short rows")
+        yield from read_padded_csv_batches(csv_path, columns, skip_rows=loaded)
+
+def read_padded_csv_batches(csv_path, columns, skip_rows=0):
+    """Parse a ragged CSV with the csv module, padding short rows with empty strings.
+
+    Arrow rejects rows with missing trailing fields, which some exports contain.
+    Rows with more fields than the header are an error, as they were with pandas,
+    rather than being cut down and silently losing data.
+    """
+    width = len(columns)
+    
+    def to_batch(rows):
+        return pa.record_batch([pa.array(col, type=pa.string()) for col in zip(*rows)], names=columns)
+    
+    with open(csv_path, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        next(reader)
+        for _ in itertools.islice(reader, skip_rows):
+            pass
+        rows = []
+        for row in reader:
+            if len(row) > width:
+                raise ValueError(f"{csv_path} line {reader.line_num}: expected {width} fields, saw {len(row)}")
+            rows.append(row + [''] * (width - len(row)))
+            if len(rows) == PADDED_BATCH_ROWS:
+                yield to_batch(rows)
+                rows = []
+        if rows:
+            yield to_batch(rows)
+
+def iter_batch_rows(batches):
+    """Yield rows as tuples while a worker thread converts upcoming Arrow batches.
+
+    sqlite3 releases the GIL while it steps each INSERT, so converting the next
+    batch to Python tuples on another thread overlaps with the current inserts.
+    At most ``ROW_PREFETCH_BATCHES`` converted batches are held at a time.
+    """
+    ready = queue.Queue(maxsize=ROW_PREFETCH_BATCHES)
+    stop = threading.Event()
+    
+    def put(item):
+        # Give up once the consumer has stopped reading rather than block on a full queue forever
+        while not stop.is_set():
+            try:
+                ready.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+    
+    def convert():
+        try:
+            for batch in batches:
+                if not put(list(zip(*(column.to_pylist() for column in batch.columns)))):
+                    return
+            put(None)
+        except Exception as e:
+            put(e)
+    
+    threading.Thread(target=convert, daemon=True).start()
+    try:
+        while (rows := ready.get()) is not None:
+            if isinstance(rows, Exception):
+                raise rows
+            yield from rows
+    finally:
+        stop.set()
+
+def load_batches_into_table(conn, table_name, batches, columns):
+    """Create a TEXT-only table and stream Arrow batches into it, returning the row count.
+
+    Every column is a string, so the table is declared up front and rows go straight
+    through a single ``executemany`` inside a single explicit transaction.
+    """
+    column_defs = ', '.join(f'[{col}] TEXT' for col in columns)
+    placeholders = ', '.join('?' * len(columns))
+    rows = iter_batch_rows(batches)
+    try:
+        with conn:
+            conn.execute('BEGIN')
+            conn.execute(f'CREATE TABLE [{table_name}] ({column_defs})')
+            cursor = conn.executemany(
+                f'INSERT INTO [{table_name}] VALUES ({placeholders})',
+                rows
+            )
+    finally:
+        # Stops the conversion thread if the inserts failed part-way
+        rows.close()
+    return cursor.rowcount
+
+def build_fts_index(conn, table_name, columns):
+    """Create an external-content FTS5 index for a table and backfill it in one statement.
+
+    The sync triggers are only created once the backfill is done, so the bulk
+    copy never touches them.
+    """
+    fts_columns = ', '.join(f'[{col}]' for col in columns)
+    new_values = ', '.join(f'new.[{col}]' for col in columns)
+    old_values = ', '.join(f'old.[{col}]' for col in columns)
+    fts_table = f'{table_name}_fts'
+    try:
+        conn.executescript(f"""
+            BEGIN;
+            CREATE VIRTUAL TABLE [{fts_table}] USING fts5(
+                {fts_columns}, content='{table_name}', content_rowid='rowid',
+                tokenize='{FTS_TOKENIZER}'
+            );
+            INSERT INTO [{fts_table}] (rowid, {fts_columns})
+                SELECT rowid, {fts_columns} FROM [{table_name}];
+
+            CREATE TRIGGER [{table_name}_ai] AFTER INSERT ON [{table_name}] BEGIN
+                INSERT INTO [{fts_table}] (rowid, {fts_columns}) VALUES (new.rowid, {new_values});
+            END;
+            CREATE TRIGGER [{table_name}_ad] AFTER DELETE ON [{table_name}] BEGIN
+                INSERT INTO [{fts_table}] ([{fts_table}], rowid, {fts_columns}) VALUES ('delete', old.rowid, {old_values});
+            END;
+            CREATE TRIGGER [{table_name}_au] AFTER UPDATE ON [{table_name}] BEGIN
+                INSERT INTO [{fts_table}] ([{fts_table}], rowid, {fts_columns}) VALUES ('delete', old.rowid, {old_values});
+                INSERT INTO [{fts_table}] (rowid, {fts_columns}) VALUES (new.rowid, {new_values});
+            END;
+            COMMIT;
+        """)
+    except sqlite3.Error:
+        # executescript stops at the failing statement and leaves the BEGIN open
+        if conn.in_transaction:
+            conn.rollback()
+        raise
+
+def record_content_hash(conn, tables):
+    """Store a hash of every row of ``tables`` in build_info.
+
+    The NLP service reads this one row to tell whether its cached answers still
+    match the data, instead of scanning the tables itself.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for table in tables:
+        for row in conn.execute(f'SELECT * FROM [{table}]'):
+            digest.update(repr(row).encode('utf-8'))
+    with conn:
+        conn.execute('CREATE TABLE build_info (key TEXT PRIMARY KEY, value TEXT)')
+        conn.execute("INSERT INTO build_info VALUES ('content_hash', ?)", (digest.hexdigest(),))
+
+def database_is_current(db_path, csv_paths):
+    """Return True if the database is newer than every source CSV and was built by this version.
+
+    A database from an older build - without the query indexes, planner statistics,
+    build_info or the current FTS tokenizer - is rebuilt however new the file is.
+    """
+    if not os.path.exists(db_path):
+        return False
+    if os.path.getmtime(db_path) <= max(os.path.getmtime(path) for path in csv_paths):
+        return False
+    try:
+        conn = sqlite3.connect(f'file:{os.path.abspath(db_path)}?mode=ro', uri=True)
+        try:
+            objects = dict(conn.execute("SELECT name, sql FROM sqlite_master"))
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return False
+    expected = set(re.findall(r'CREATE INDEX IF NOT EXISTS (\w+)', QUERY_INDEXES)) | {'sqlite_stat1', 'build_info'}
+    if not expected <= objects.keys():
+        return False
+    return all(f"tokenize='{FTS_TOKENIZER}'" in (sql or '')
+               for name, sql in objects.items() if name.endswith('_fts'))
+
+def setup_database(force=False, verbose=False):
+    """Create SQLite database from CSV files with FTS support.
+
+    The rebuild is skipped when the existing database is newer than all of the
+    CSV files and has this version's indexes and FTS tokenizer, unless ``force``
+    is set. Column lists and mappings are only printed when ``verbose`` is set.
+    """
+    db_path = 'josys_data.db'
+    csv_paths = ('josys-devices.csv', 'josys-provisions.csv', 'josys-app-portfolio.csv')
+    if not force and database_is_current(db_path, csv_paths):
+        print(f"✅ {db_path} is up to date with the CSV files - nothing to rebuild")
+        return db_path
+    
+    # Read only the CSV headers up front; rows are streamed straight into SQLite later
+    print("Reading CSV headers...")
+    print("Loading josys-devices.csv header...")
+    original_device_cols = read_csv_header('josys-devices.csv')
+    print(f"Devices CSV: {len(original_device_cols)} columns")
+    if verbose:
+        print("Device columns:", original_device_cols)
+    
+    print("\nLoading josys-provisions.csv header...")
+    original_provision_cols = read_csv_header('josys-provisions.csv')
+    print(f"Provisions CSV: {len(original_provision_cols)} columns")
+    if verbose:
+        print("Provision columns:", original_provision_cols)
+    
+    print("\nLoading josys-app-portfolio.csv header...")
+    original_portfolio_cols = read_csv_header('josys-app-portfolio.csv')
+    print(f"Portfolio CSV: {len(original_portfolio_cols)} columns")
+    if verbose:
+        print("Portfolio columns:", original_portfolio_cols)
     
     # Clean column names for SQLite compatibility
     print("\nCleaning column names...")
-    original_device_cols = list(devices_df.columns)
-    devices_df.columns = [clean_column_name(col) for col in devices_df.columns]
-    
-    original_provision_cols = list(provisions_df.columns)
-    provisions_df.columns = [clean_column_name(col) for col in provisions_df.columns]
-    
-    original_portfolio_cols = list(portfolio_df.columns)
-    portfolio_df.columns = [clean_column_name(col) for col in portfolio_df.columns]
+    device_columns = clean_column_names(original_device_cols)
+    provision_columns = clean_column_names(original_provision_cols)
+    portfolio_columns = clean_column_names(original_portfolio_cols)
     
     # Print column mapping for verification
-    print("\nDevice column mapping:")
-    for orig, clean in zip(original_device_cols, devices_df.columns):
-        if orig != clean:
-            print(f"  '{orig}' -> '{clean}'")
-    
-    print("\nProvision column mapping:")
-    for orig, clean in zip(original_provision_cols, provisions_df.columns):
-        if orig != clean:
-            print(f"  '{orig}' -> '{clean}'")
-    
-    print("\nPortfolio column mapping:")
-    for orig, clean in zip(original_portfolio_cols, portfolio_df.columns):
-        if orig != clean:
-            print(f"  '{orig}' -> '{clean}'")
-    
-    print(f"\nFinal device columns ({len(devices_df.columns)}): {list(devices_df.columns)}")
-    print(f"\nFinal provision columns ({len(provisions_df.columns)}): {list(provisions_df.columns)}")
-    print(f"\nFinal portfolio columns ({len(portfolio_df.columns)}): {list(portfolio_df.columns)}")
-    
-    # Create database
-    db_path = 'josys_data.db'
-    if os.path.exists(db_path):
-        os.remove(db_path)
+    if verbose:
+        print("\nDevice column mapping:")
+        for orig, clean in zip(original_device_cols, device_columns):
+            if orig != clean:
+                print(f"  '{orig}' -> '{clean}'")
+    
+        print("\nProvision column mapping:")
+        for orig, clean in zip(original_provision_cols, provision_columns):
+            if orig != clean:
+                print(f"  '{orig}' -> '{clean}'")
+    
+        print("\nPortfolio column mapping:")
+        for orig, clean in zip(original_portfolio_cols, portfolio_columns):
+            if orig != clean:
+                print(f"  '{orig}' -> '{clean}'")
+    
+        print(f"\nFinal device columns ({len(device_columns)}): {device_columns}")
+        print(f"\nFinal provision columns ({len(provision_columns)}): {provision_columns}")
+        print(f"\nFinal portfolio columns ({len(portfolio_columns)}): {portfolio_columns}")
+    
+    # Create database - built under a temporary name and only moved into place once
+    # complete, so a failed run never leaves a half-built file that looks up to date
+    build_path = f'{db_path}.tmp'
+    if os.path.exists(build_path):
+        os.remove(build_path)
     
     print(f"\nCreating SQLite database: {db_path}")
-    db = Database(db_path)
-    
-    # Insert data into tables - preserve ALL columns
-    print("Creating devices table with ALL columns...")
-    devices_records = devices_df.to_dict('records')
-    db['devices'].insert_all(devices_records)
-    print(f"  ✓ Inserted {len(devices_records)} device records with {len(devices_df.columns)} columns")
-    
-    print("Creating provisions table with ALL columns...")
-    provisions_records = provisions_df.to_dict('records')
-    db['provisions'].insert_all(provisions_records)
-    print(f"  ✓ Inserted {len(provisions_records)} provision records with {len(provisions_df.columns)} columns")
-    
-    print("Creating app_portfolio table with ALL columns...")
-    portfolio_records = portfolio_df.to_dict('records')
-    db['app_portfolio'].insert_all(portfolio_records)
-    print(f"  ✓ Inserted {len(portfolio_records)} portfolio records with {len(portfolio_df.columns)} columns")
+    conn = sqlite3.connect(build_path)
+    conn.executescript(BULK_LOAD_PRAGMAS)
+    
+    # Parse the three CSVs concurrently (Arrow releases the GIL while parsing) and
+    # insert each table as soon as its batches are ready - preserve ALL columns
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        device_batches = executor.submit(stream_csv_batches, 'josys-devices.csv', device_columns)
+        provision_batches = executor.submit(stream_csv_batches, 'josys-provisions.csv', provision_columns)
+        portfolio_batches = executor.submit(stream_csv_batches, 'josys-app-portfolio.csv', portfolio_columns)
+        
+        print("Creating devices table with ALL columns...")
+        device_count = load_batches_into_table(conn, 'devices', device_batches.result(), device_columns)
+        print(f"  ✓ Inserted {device_count} device records with {len(device_columns)} columns")
+        
+        print("Creating provisions table with ALL columns...")
+        provision_count = load_batches_into_table(conn, 'provisions', provision_batches.result(), provision_columns)
+        print(f"  ✓ Inserted {provision_count} provision records with {len(provision_columns)} columns")
+        
+        print("Creating app_portfolio table with ALL columns...")
+        portfolio_count = load_batches_into_table(conn, 'app_portfolio', portfolio_batches.result(), portfolio_columns)
+        print(f"  ✓ Inserted {portfolio_count} portfolio records with {len(portfolio_columns)} columns")
     
     # Enable FTS (Full-Text Search) on key searchable columns
     print("\nSetting up full-text search...")
     
     # FTS for devices table - identify searchable text columns
-    device_text_columns = []
-    for col in devices_df.columns:
-        col_lower = col.lower()
-        if any(keyword in col_lower for keyword in [
-            'asset', 'device', 'type', 'manufacturer', 'model', 'system', 
-            'information', 'email', 'city', 'region', 'status', 'vendor'
-        ]):
-            device_text_columns.append(col)
-    
-    print(f"Device FTS columns: {device_text_columns}")
+    device_text_columns = select_fts_columns(device_columns, DEVICE_FTS_KEYWORDS)
+    if verbose:
+        print(f"Device FTS columns: {device_text_columns}")
     if device_text_columns:
         try:
-            db['devices'].enable_fts(device_text_columns, create_triggers=True)
+            build_fts_index(conn, 'devices', device_text_columns)
             print(f"  ✓ Enabled FTS on {len(device_text_columns)} device columns")
         except Exception as e:
             print(f"  ⚠ FTS setup warning for devices: {e}")
     
     # FTS for provisions table - identify searchable text columns
-    provision_text_columns = []
-    for col in provisions_df.columns:
-        col_lower = col.lower()
-        if any(keyword in col_lower for keyword in [
-            'first', 'last', 'name', 'user', 'email', 'username', 
-            'role', 'status', 'location'
-        ]):
-            provision_text_columns.append(col)
-    
-    print(f"Provision FTS columns: {provision_text_columns}")
+    provision_text_columns = select_fts_columns(provision_columns, PROVISION_FTS_KEYWORDS)
+    if verbose:
+        print(f"Provision FTS columns: {provision_text_columns}")
     if provision_text_columns:
         try:
-            db['provisions'].enable_fts(provision_text_columns, create_triggers=True)
+            build_fts_index(conn, 'provisions', provision_text_columns)
             print(f"  ✓ Enabled FTS on {len(provision_text_columns)} provision columns")
         except Exception as e:
             print(f"  ⚠ FTS setup warning for provisions: {e}")
     
     # FTS for app_portfolio table - identify searchable text columns
-    portfolio_text_columns = []
-    for col in portfolio_df.columns:
-        col_lower = col.lower()
-        if any(keyword in col_lower for keyword in [
-            'app', 'identifier', 'role', 'first', 'last', 'name', 'email', 
-            'status', 'category', 'department', 'title', 'additional'
-        ]):
-            portfolio_text_columns.append(col)
-    
-    print(f"Portfolio FTS columns: {portfolio_text_columns}")
+    portfolio_text_columns = select_fts_columns(portfolio_columns, PORTFOLIO_FTS_KEYWORDS)
+    if verbose:
+        print(f"Portfolio FTS columns: {portfolio_text_columns}")
     if portfolio_text_columns:
         try:
-            db['app_portfolio'].enable_fts(portfolio_text_columns, create_triggers=True)
+            build_fts_index(conn, 'app_portfolio', portfolio_text_columns)
             print(f"  ✓ Enabled FTS on {len(portfolio_text_columns)} portfolio columns")
         except Exception as e:
             print(f"  ⚠ FTS setup warning for app_portfolio: {e}")
@@ -162,109 +509,96 @@ def setup_database():
     print("\nCreating helpful views...")
     
     # Find the actual column names in the cleaned format
-    asset_num_col = next((col for col in devices_df.columns if 'asset' in col.lower() and 'number' in col.lower()), 'Asset_Number')
-    device_type_col = next((col for col in devices_df.columns if 'device' in col.lower() and 'type' in col.lower()), 'Device_Type')
-    device_status_col = next((col for col in devices_df.columns if 'device' in col.lower() and 'status' in col.lower()), 'Device_Status')
-    manufacturer_col = next((col for col in devices_df.columns if 'manufacturer' in col.lower()), 'Manufacturer')
-    model_name_col = next((col for col in devices_df.columns if 'model' in col.lower() and 'name' in col.lower()), 'Model_Name')
-    assigned_email_col = next((col for col in devices_df.columns if 'assigned' in col.lower() and 'email' in col.lower()), 'Assigned_User_s_Email')
-    city_col = next((col for col in devices_df.columns if 'city' in col.lower()), 'City')
-    region_col = next((col for col in devices_df.columns if 'region' in col.lower()), 'Region')
-    additional_info_col = next((col for col in devices_df.columns if 'additional' in col.lower() and 'information' in col.lower()), 'Additional_Information')
-    
-    user_id_col = next((col for col in provisions_df.columns if 'user' in col.lower() and 'id' in col.lower()), 'User_ID')
-    first_name_col = next((col for col in provisions_df.columns if 'first' in col.lower() and 'name' in col.lower()), 'First_Name')
-    last_name_col = next((col for col in provisions_df.columns if 'last' in col.lower() and 'name' in col.lower()), 'Last_Name')
-    email_col = next((col for col in provisions_df.columns if col.lower() == 'email'), 'Email')
-    status_col = next((col for col in provisions_df.columns if col.lower() == 'status'), 'Status')
-    role_col = next((col for col in provisions_df.columns if col.lower() == 'role'), 'Role')
-    work_location_col = next((col for col in provisions_df.columns if 'work' in col.lower() and 'location' in col.lower()), 'Work_Location_Code')
+    dev = resolve_view_columns(device_columns, DEVICE_VIEW_COLUMNS)
+    prov = resolve_view_columns(provision_columns, PROVISION_VIEW_COLUMNS)
+    port = resolve_view_columns(portfolio_columns, PORTFOLIO_VIEW_COLUMNS)
     
     # Create views with dynamic column names
     active_devices_view = f'''
         CREATE VIEW IF NOT EXISTS active_devices_with_users AS
         SELECT 
-            {asset_num_col} as Asset_Number,
-            {device_type_col} as Device_Type,
-            {manufacturer_col} as Manufacturer,
-            {model_name_col} as Model_Name,
-            {device_status_col} as Device_Status,
-            {assigned_email_col} as Assigned_Users_Email,
-            {city_col} as City,
-            {region_col} as Region,
-            {additional_info_col} as Additional_Information
+            {dev['asset_number']} as Asset_Number,
+            {dev['device_type']} as Device_Type,
+            {dev['manufacturer']} as Manufacturer,
+            {dev['model_name']} as Model_Name,
+            {dev['device_status']} as Device_Status,
+            {dev['assigned_email']} as Assigned_Users_Email,
+            {dev['city']} as City,
+            {dev['region']} as Region,
+            {dev['additional_info']} as Additional_Information
         FROM devices 
-        WHERE {device_status_col} = 'In-use' AND {assigned_email_col} IS NOT NULL AND {assigned_email_col} != '';
+        WHERE {dev['device_status']} = 'In-use' AND {dev['assigned_email']} IS NOT NULL AND {dev['assigned_email']} != '';
     '''
     
     user_summary_view = f'''
         CREATE VIEW IF NOT EXISTS user_access_summary AS
         SELECT 
-            {user_id_col} as User_ID,
-            {first_name_col} as First_Name,
-            {last_name_col} as Last_Name,
-            {email_col} as Email,
-            {status_col} as Status,
-            {role_col} as Role,
-            {work_location_col} as Work_Location_Code
+            {prov['user_id']} as User_ID,
+            {prov['first_name']} as First_Name,
+            {prov['last_name']} as Last_Name,
+            {prov['email']} as Email,
+            {prov['status']} as Status,
+            {prov['role']} as Role,
+            {prov['work_location']} as Work_Location_Code
         FROM provisions 
-        WHERE {status_col} = 'Active';
+        WHERE {prov['status']} = 'Active';
     '''
     
-    try:
-        db.executescript(active_devices_view)
-        print("  ✓ Created active_devices_with_users view")
-    except Exception as e:
-        print(f"  ⚠ View creation warning: {e}")
-    
-    try:
-        db.executescript(user_summary_view)
-        print("  ✓ Created user_access_summary view")
-    except Exception as e:
-        print(f"  ⚠ View creation warning: {e}")
-    
     # Create portfolio view with dynamic column names
-    app_col = next((col for col in portfolio_df.columns if col.lower() == 'app'), 'App')
-    identifier_col = next((col for col in portfolio_df.columns if 'identifier' in col.lower()), 'Identifier')
-    id_col = next((col for col in portfolio_df.columns if col.lower() == 'id'), 'ID')
-    account_status_col = next((col for col in portfolio_df.columns if 'account' in col.lower() and 'status' in col.lower()), 'Account_Status')
-    roles_col = next((col for col in portfolio_df.columns if 'role' in col.lower() and '(' in col), 'Role_s_')
-    portfolio_email_col = next((col for col in portfolio_df.columns if col.lower() == 'email'), 'Email')
-    portfolio_user_id_col = next((col for col in portfolio_df.columns if 'user' in col.lower() and 'id' in col.lower()), 'User_ID')
-    
     app_access_view = f'''
         CREATE VIEW IF NOT EXISTS app_access_summary AS
         SELECT 
-            {app_col} as App,
-            {identifier_col} as Identifier,
-            {id_col} as User_Account,
-            {account_status_col} as Account_Status,
-            {roles_col} as Roles,
-            {portfolio_email_col} as Email,
-            {portfolio_user_id_col} as User_ID
+            {port['app']} as App,
+            {port['identifier']} as Identifier,
+            {port['id']} as User_Account,
+            {port['account_status']} as Account_Status,
+            {port['roles']} as Roles,
+            {port['email']} as Email,
+            {port['user_id']} as User_ID
         FROM app_portfolio 
-        WHERE {account_status_col} = 'Activated';
+        WHERE {port['account_status']} = 'Activated';
     '''
     
     try:
-        db.executescript(app_access_view)
-        print("  ✓ Created app_access_summary view")
+        conn.executescript(active_devices_view + user_summary_view + app_access_view)
+        print("  ✓ Created active_devices_with_users, user_access_summary and app_access_summary views")
     except Exception as e:
         print(f"  ⚠ View creation warning: {e}")
     
+    # Index the query columns, then gather planner statistics so joins start
+    # from the most selective table
+    try:
+        conn.executescript(QUERY_INDEXES)
+        conn.execute("ANALYZE")
+        print("  ✓ Created query indexes and planner statistics")
+    except Exception as e:
+        print(f"  ⚠ Index creation warning: {e}")
+    
+    record_content_hash(conn, ('devices', 'provisions', 'app_portfolio'))
+    
+    # Bulk load is done - switch back to safe journaling for normal use
+    conn.executescript(SERVING_PRAGMAS)
+    
     # Verify the database
     print(f"\n✅ Database created successfully: {db_path}")
-    print(f"   📊 Devices table: {len(devices_df)} records, {len(devices_df.columns)} columns")
-    print(f"   👥 Provisions table: {len(provisions_df)} records, {len(provisions_df.columns)} columns")
-    print(f"   🏢 App Portfolio table: {len(portfolio_df)} records, {len(portfolio_df.columns)} columns")
+    print(f"   📊 Devices table: {device_count} records, {len(device_columns)} columns")
+    print(f"   👥 Provisions table: {provision_count} records, {len(provision_columns)} columns")
+    print(f"   🏢 App Portfolio table: {portfolio_count} records, {len(portfolio_columns)} columns")
     
     # Show table schemas
-    print(f"\n📋 Table schemas:")
-    print(f"   Devices columns: {', '.join(devices_df.columns)}")
-    print(f"   Provisions columns: {', '.join(provisions_df.columns[:10])}... (showing first 10 of {len(provisions_df.columns)})")
-    print(f"   Portfolio columns: {', '.join(portfolio_df.columns)}")
-    
+    if verbose:
+        print(f"\n📋 Table schemas:")
+        print(f"   Devices columns: {', '.join(device_columns)}")
+        print(f"   Provisions columns: {', '.join(provision_columns[:10])}... (showing first 10 of {len(provision_columns)})")
+        print(f"   Portfolio columns: {', '.join(portfolio_columns)}")
+    
+    conn.close()
+    os.replace(build_path, db_path)
     return db_path
 
 if __name__ == "__main__":
-    setup_database()
+    parser = argparse.ArgumentParser(description="Build josys_data.db from the Josys CSV exports.")
+    parser.add_argument('-v', '--verbose', action='store_true', help="print column lists and name mappings")
+    parser.add_argument('-f', '--force', action='store_true', help="rebuild even if the database is up to date")
+    args = parser.parse_args()
+    setup_database(force=args.force, verbose=args.verbose)
@@ -6,22 +6,775 @@ Uses OpenAI API for NL2SQL and embeddings for semantic search
 
 import os
 import json
+import gzip
+import hashlib
 import sqlite3
 import time
-from typing import List, Dict, Any, Optional
-from flask import Flask, request, jsonify, render_template_string
+import re
+import asyncio
+import importlib.util
+from pathlib import Path
+from typing import List, Dict, Any, Callable, Iterable, Optional
+from flask import Flask, Response, request, jsonify
+from flask.json.provider import DefaultJSONProvider
 import openai
 import threading
+import queue
+from collections import Counter, OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import lru_cache
+from itertools import islice
 from dotenv import load_dotenv
 import numpy as np
 
+try:
+    import orjson
+except ImportError:  # optional: fall back to the stdlib encoder
+    orjson = None
+
+try:
+    import httpx
+except ImportError:  # newer OpenAI SDKs bring their own HTTP client
+    httpx = None
+
+NL2SQL_MODEL = "gpt-4o-mini"
+
+# Generated SQL that SQLite rejects is sent back to the model with the error this many times
+NL2SQL_MAX_RETRIES = 1
+
+# Upper bound on simultaneous chat completion requests across all Flask threads
+OPENAI_MAX_CONCURRENT_REQUESTS = 16
+EMBEDDING_MODEL = "text-embedding-3-small"
+
+# Forces the NL2SQL reply to be a JSON object holding just the query
+SQL_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "sql_response",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {"sql": {"type": "string"}},
+            "required": ["sql"],
+            "additionalProperties": False
+        }
+    }
+}
+
+# Pooled OpenAI connections stay open this long between questions (httpx's default is 5s)
+OPENAI_KEEPALIVE_SECONDS = 120
+OPENAI_MAX_KEEPALIVE_CONNECTIONS = 20
+
+# Per-attempt limit on an OpenAI request (the SDK default is 10 minutes). With the SDK's
+# two retries a stalled call still fails before gunicorn's WEB_TIMEOUT kills the worker.
+OPENAI_TIMEOUT_SECONDS = 30.0
+
+# Embedding requests are batched; batches run concurrently up to the semaphore limit
+EMBEDDING_BATCH_SIZE = 1024
+EMBEDDING_CONCURRENCY = 8
+
+# Question embeddings requested while another embedding call is in flight share the next request
+EMBEDDING_COALESCE_MAX = 32
+
+# Production server: gunicorn gthread workers, each with a pool of request threads.
+# Chat completions are I/O bound, so threads keep one slow answer from blocking others.
+WEB_WORKERS = int(os.getenv('WEB_CONCURRENCY', min(4, os.cpu_count() or 1)))
+WEB_THREADS = int(os.getenv('WEB_THREADS', 8))
+WEB_TIMEOUT = 120
+
+# JSON bodies at least this large are gzipped for clients that accept it
+COMPRESS_MIN_SIZE = 500
+COMPRESS_LEVEL = 6
+
+# Generated SQL that runs longer than this is interrupted (e.g. an accidental cross join)
+GENERATED_SQL_TIMEOUT_SECONDS = 5.0
+
+# Rows returned for one generated query; generated SQL without a LIMIT can't pull a whole table
+MAX_RESULT_ROWS = 1000
+
+# Longer questions are rejected before any lookup; real questions are a sentence or two
+MAX_QUESTION_LENGTH = 500
+
+# Successful GET /api/nlp-search answers may be reused by the browser for this long
+SEARCH_CACHE_MAX_AGE = 60
+
+# Follow-up queries offered after an empty multi-criteria answer, sent as plain query text
+SUGGEST_APPLE_AWS_ADMINS = "Apple laptop users with AWS admin access"
+SUGGEST_AWS_ADMIN_DEVICES = "What devices do AWS admins use?"
+
+# Questions embedded at startup: the UI examples, the suggested follow-ups and the
+# examples in the NL2SQL prompt
+WARMUP_QUESTIONS = [
+    "list all devices assigned to Arvind",
+    "show me MacBook laptops in Bangalore",
+    "which users have GitHub access?",
+    "find available devices for IT admins",
+    "who is using Apple devices?",
+    "list names that have a macbook and inactive notion licence",
+    "devices assigned to Arvind",
+    "MacBook laptops",
+    "MacBook laptops assigned to employees in India",
+    "users with GitHub access",
+    "available devices in Bangalore",
+    "names with multiple DataDog licenses",
+    "AWS access for users",
+    "AWS Admin usernames",
+    "AWS admins in Japan",
+    "employees in Japan",
+    "Lenovo laptop users with AWS admin and Notion",
+    "users with AdministratorAccess role",
+    "monthly costs for GitHub access",
+    "contractors with application access",
+    "names with MacBook and Notion license",
+    "users with Apple devices and GitHub access",
+    "users with devices and detailed AWS access",
+    SUGGEST_APPLE_AWS_ADMINS,
+    SUGGEST_AWS_ADMIN_DEVICES,
+]
+
+# Exact-question result cache and question embedding cache limits
+QUERY_CACHE_PATH = 'query_cache.db'
+QUERY_CACHE_MAX_ENTRIES = 500
+QUERY_CACHE_TTL_SECONDS = 3600
+EMBEDDING_CACHE_MAX_ENTRIES = 5000
+# How often a worker checks whether another worker cleared the shared caches
+CACHE_SYNC_INTERVAL_SECONDS = 1.0
+# Embeddings only depend on the text and model, so they are kept on disk for a long time
+EMBEDDING_CACHE_TTL_SECONDS = 30 * 24 * 3600
+ANALYSIS_CACHE_MAX_ENTRIES = 128
+PLAN_CACHE_MAX_ENTRIES = 500
+
+# Raw NL2SQL completions, keyed by a hash of the whole request. The prompt embeds the
+# schema, so a changed schema or prompt misses instead of returning stale SQL, and
+# the SQL for a question stays valid long after its cached result rows go stale.
+COMPLETION_CACHE_MAX_ENTRIES = 2000
+COMPLETION_CACHE_TTL_SECONDS = 7 * 24 * 3600
+
+# Paraphrased questions whose embeddings are at least this similar reuse a cached result
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv('SEMANTIC_CACHE_THRESHOLD', 0.92))
+SEMANTIC_CACHE_MAX_ENTRIES = 1000
+SEMANTIC_CACHE_TTL_SECONDS = float(os.getenv('SEMANTIC_CACHE_TTL_SECONDS', 3600))
+
+# Keywords the insight and breakdown dispatchers look for in questions
+_DEVICE_TERMS = frozenset({'laptop', 'device', 'computer', 'phone', 'lenovo', 'apple', 'macbook'})
+_USER_TERMS = frozenset({'user', 'employee', 'person', 'people', 'staff'})
+_APPLICATION_TERMS = frozenset({'aws', 'admin', 'notion', 'github', 'slack', 'app', 'access', 'license'})
+_GEOGRAPHIC_TERMS = frozenset({'japan', 'india', 'bangalore', 'tokyo', 'location'})
+_ROLE_TERMS = frozenset({'role', 'department', 'title', 'position'})
+_APPLE_TERMS = frozenset({'apple', 'macbook'})
+_AWS_REGION_TERMS = frozenset({'japan', 'india'})
+_JAPAN_QUESTION_TERMS = frozenset({'japan', 'tomoyo', 'mari', 'kohei'})
+_BREAKDOWN_TERMS = _DEVICE_TERMS | _USER_TERMS | _APPLICATION_TERMS | _GEOGRAPHIC_TERMS | _ROLE_TERMS
+_CRITERIA_TERMS = (
+    frozenset({'lenovo', 'apple', 'laptop', 'device'}),
+    frozenset({'aws', 'admin', 'administrator'}),
+    frozenset({'notion', 'github', 'slack', 'license'}),
+    frozenset({'japan', 'india', 'bangalore'}),
+)
+_QUESTION_KEYWORDS = frozenset().union(
+    _DEVICE_TERMS, _USER_TERMS, _APPLICATION_TERMS, _GEOGRAPHIC_TERMS, _ROLE_TERMS,
+    _JAPAN_QUESTION_TERMS, *_CRITERIA_TERMS)
+
+# One left-to-right pass finds the longest keyword starting at each position (the
+# lookahead lets matches overlap); every keyword contained in it is present too
+_KEYWORD_SCANNER = re.compile(
+    '(?=(' + '|'.join(map(re.escape, sorted(_QUESTION_KEYWORDS, key=len, reverse=True))) + '))')
+_CONTAINED_KEYWORDS = {
+    keyword: frozenset(other for other in _QUESTION_KEYWORDS if other in keyword) for keyword in _QUESTION_KEYWORDS
+}
+
+@lru_cache(maxsize=256)
+def _question_terms(question_lower: str) -> frozenset:
+    """Return the set of keywords occurring anywhere in the question (substring match)."""
+    terms = set()
+    for match in _KEYWORD_SCANNER.finditer(question_lower):
+        terms |= _CONTAINED_KEYWORDS[match.group(1)]
+    return frozenset(terms)
+
+# First names that suggest a Japan-based employee, matching the SQL heuristic
+_JAPANESE_FIRST_NAMES = frozenset({'tomoyo', 'mari', 'kohei', 'yuki', 'akira'})
+
+# Question words and SQL string literals, for turning generated SQL into reusable plans
+_QUESTION_WORD = re.compile(r"[a-z]+")
+_WORD_CHARACTER = re.compile(r"[^\W_]")
+_SQL_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+
+# Common question shapes answered with fixed SQL instead of an OpenAI call. Each
+# pattern must match the whole lowercased question; named groups are bound as
+# query parameters, never formatted into the SQL.
+_NAME = r"(?P<name>[a-z][a-z0-9._'-]*)"
+_SQL_TEMPLATES = [
+    (re.compile(rf"(?:(?:list|show|show me|find) )?(?:all )?(?:the )?devices? (?:assigned to|owned by|of) {_NAME}\??"),
+     "SELECT * FROM devices WHERE Assigned_User_s_Email LIKE '%' || :name || '%' "
+     "OR Assigned_User_s_ID LIKE '%' || :name || '%' LIMIT 20"),
+    (re.compile(r"(?:(?:list|show|show me|find) )?(?:all )?(?:the )?(?:macbooks?|macbook laptops?)\??"),
+     "SELECT * FROM devices WHERE UPPER(Device_Type) = 'LAPTOP' AND UPPER(Manufacturer) = 'APPLE' LIMIT 20"),
+    (re.compile(r"(?:(?:which|list|show|show me) )?users (?:have|with) github access\??|who has github access\??"),
+     "SELECT * FROM provisions WHERE GitHub IS NOT NULL AND GitHub != '' LIMIT 20"),
+    (re.compile(r"(?:(?:list|show|show me|find) )?(?:all )?(?:the )?available devices\??"),
+     "SELECT * FROM devices WHERE Device_Status LIKE '%available%' LIMIT 20"),
+    (re.compile(r"(?:(?:list|show|show me|find) )?(?:all )?contractors with application access\??"),
+     "SELECT * FROM app_portfolio WHERE User_Category = 'Contractor' AND Account_Status = 'Activated' LIMIT 20"),
+    (re.compile(r"(?:who (?:owns|has)|(?:(?:show|find) )?(?:the )?owner of) (?:the )?(?:device|asset|laptop) "
+                r"(?P<asset>[a-z0-9-]*\d[a-z0-9-]*)\??"),
+     "SELECT * FROM devices WHERE Asset_Number = :asset COLLATE NOCASE LIMIT 20"),
+    (re.compile(r"(?:(?:list|show|show me|find) )?(?:all )?(?:the )?devices? (?:in|at) (?P<city>[a-z]+(?: [a-z]+)?)\??"),
+     "SELECT * FROM devices WHERE City = :city COLLATE NOCASE LIMIT 20"),
+    (re.compile(r"(?:(?:list|show|show me|find|who are) )?(?:all )?(?:the )?(?:it admins|users with it admin role)\??"),
+     "SELECT * FROM provisions WHERE Role LIKE '%IT Admin%' LIMIT 20"),
+]
+
+# Statements the read connections may prepare: plain reads, PRAGMA table_info for the
+# schema, and what FTS5 does when it first opens an index (it re-declares the table
+# through sqlite_master and reads PRAGMA data_version)
+_READ_ACTIONS = frozenset({sqlite3.SQLITE_SELECT, sqlite3.SQLITE_READ, sqlite3.SQLITE_FUNCTION,
+                           sqlite3.SQLITE_RECURSIVE, sqlite3.SQLITE_TRANSACTION})
+_READ_PRAGMAS = frozenset({'table_info', 'data_version'})
+
+def _authorize_read(action, arg1, arg2, db_name, trigger):
+    """SQLite authorizer for the read connections, which also run model-generated SQL.
+    
+    mode=ro only protects the main database; this also refuses ATTACH, temp tables
+    and other PRAGMAs when the statement is prepared.
+    """
+    if (action in _READ_ACTIONS
+            or (action == sqlite3.SQLITE_PRAGMA and arg1 in _READ_PRAGMAS)
+            or (action == sqlite3.SQLITE_UPDATE and arg1 == 'sqlite_master')):
+        return sqlite3.SQLITE_OK
+    return sqlite3.SQLITE_DENY
+
+# Human-readable descriptions of the columns mentioned in the NL2SQL schema
+_COLUMN_DESCRIPTIONS: Dict[str, Dict[str, str]] = {
+    'devices': {
+        'Asset_Number': 'Unique device identifier',
+        'Device_Type': 'Type of device (Laptop, Computer, etc.)',
+        'Manufacturer': 'Device manufacturer (Apple, Dell, etc.)',
+        'Model_Name': 'Specific model name',
+        'Device_Status': 'Current status (Available, Assigned, etc.)',
+        'Assigned_User_s_Email': 'Email of user assigned to device',
+        'Assigned_User_s_ID': 'User ID of assigned user',
+        'City': 'Location city',
+        'Region': 'Geographic region'
+    },
+    'provisions': {
+        'User_ID': 'Unique user identifier',
+        'First_Name': 'User first name',
+        'Last_Name': 'User last name', 
+        'Email': 'User email address',
+        'Role': 'Job role/title',
+        'Status': 'User status (Active, Inactive)',
+        'Work_Location_Code': 'Office location code'
+    },
+    'app_portfolio': {
+        'App': 'Application name (e.g., AWS, GitHub, Slack)',
+        'Identifier': 'Application instance/account identifier',
+        'ID': 'Username/login ID for the application (e.g., email or account name)',
+        'Account_Status': 'Account status (Activated, Invited, etc.)',
+        'Monthly_Expense': 'Monthly cost for this access',
+        'Role_s': 'User roles/permissions in the application',
+        'Additional_Information': 'Extra details about the access',
+        'First_Name': 'User first name',
+        'Last_Name': 'User last name',
+        'User_Status': 'User account status',
+        'Email': 'User email address',
+        'User_ID': 'Unique user identifier',
+        'User_Category': 'User type (Full-time, Contractor, etc.)',
+        'Department_s': 'User department',
+        'Job_Title': 'User job title',
+        'Role': 'User organizational role'
+    }
+}
+
+# The schema text is cached per database file so restarts skip the PRAGMA queries
+SCHEMA_CACHE_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'josys_schema.json')
+
+_ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY if orjson else 0
+
+def _dumps_json(value: Any) -> str:
+    """Serialize to JSON with orjson when installed; unknown types become strings."""
+    if orjson is not None:
+        return orjson.dumps(value, default=str, option=_ORJSON_OPTIONS).decode('utf-8')
+    return json.dumps(value, default=str)
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Flask JSON provider that encodes API responses with orjson."""
+    
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        return _dumps_json(obj)
+    
+    def loads(self, s, **kwargs: Any) -> Any:
+        return orjson.loads(s)
+    
+    def response(self, *args: Any, **kwargs: Any) -> Response:
+        obj = self._prepare_response_obj(args, kwargs)
+        body = orjson.dumps(obj, default=str, option=_ORJSON_OPTIONS)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+def _encode_vector(vector: np.ndarray) -> bytes:
+    """Pack an embedding as raw float32 bytes for the cache file."""
+    return np.asarray(vector, dtype=np.float32).tobytes()
+
+def _decode_vector(blob: bytes) -> np.ndarray:
+    return np.frombuffer(blob, dtype=np.float32)
+
+def _question_error(question: str) -> Optional[str]:
+    """Why a question is rejected before it reaches the caches or OpenAI, or None if it is acceptable."""
+    if not question:
+        return 'Question is required'
+    if len(question) < 3:
+        return 'Question too short'
+    if len(question) > MAX_QUESTION_LENGTH:
+        return f'Question too long (maximum {MAX_QUESTION_LENGTH} characters)'
+    # IDs like P0001 are mostly digits, so only input with no letters or digits at all is refused
+    if not _WORD_CHARACTER.search(question):
+        return 'Question must contain words'
+    return None
+
+# Fields that differ between identical answers (timings, cache-hit flags), left out of the ETag
+_VOLATILE_RESULT_FIELDS = frozenset({'execution_time', 'cached', 'matched_question', 'similarity'})
+
+def _result_etag(result: Dict[str, Any]) -> str:
+    """ETag for a search answer that stays the same while the answer does."""
+    stable = {key: value for key, value in result.items() if key not in _VOLATILE_RESULT_FIELDS}
+    return hashlib.sha256(_dumps_json(stable).encode('utf-8')).hexdigest()[:32]
+
+class BoundedCache:
+    """Thread-safe LRU cache with an entry limit and an optional time-to-live."""
+    
+    def __init__(self, max_entries: int, ttl_seconds: Optional[float] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # key -> (stored_at, value), least recently used first
+        self.hits = 0
+        self.misses = 0
+    
+    def __len__(self) -> int:
+        return len(self.entries)
+    
+    def __contains__(self, key) -> bool:
+        return self.get(key) is not None
+    
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+    
+    def get(self, key) -> Any:
+        """Return the value for ``key``, or None if it is missing or expired."""
+        value = self._get_local(key)
+        self._count(value is not None)
+        return value
+    
+    def _count(self, hit: bool):
+        with self.lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+    
+    def _get_local(self, key) -> Any:
+        with self.lock:
+            item = self.entries.get(key)
+            if item is None:
+                return None
+            if self.ttl_seconds is not None and time.monotonic() - item[0] >= self.ttl_seconds:
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return item[1]
+    
+    def put(self, key, value):
+        """Store ``value``, evicting the least recently used entries beyond the limit."""
+        with self.lock:
+            self.entries[key] = (time.monotonic(), value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+    
+    def clear(self):
+        """Drop every entry."""
+        with self.lock:
+            self.entries.clear()
+
+class PersistentQueryCache(BoundedCache):
+    """BoundedCache backed by a small SQLite file, so answers survive restarts and are shared by workers.
+    
+    Memory is checked first; the file is only read on a miss and written on put. Values
+    are stored as JSON unless ``encode``/``decode`` say otherwise, and the TTL is measured
+    in wall-clock time so every process agrees.
+    """
+    
+    def __init__(self, path: str = QUERY_CACHE_PATH, max_entries: int = QUERY_CACHE_MAX_ENTRIES,
+                 ttl_seconds: float = QUERY_CACHE_TTL_SECONDS, table: str = 'query_cache',
+                 encode: Callable[[Any], Any] = _dumps_json, decode: Callable[[Any], Any] = json.loads):
+        super().__init__(max_entries, ttl_seconds)
+        self.path = path
+        self.table = table
+        self.encode = encode
+        self.decode = decode
+        try:
+            with self._connect() as conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute(f"""
+                    CREATE TABLE IF NOT EXISTS {self.table} (
+                        key TEXT PRIMARY KEY, value TEXT NOT NULL, stored_at REAL NOT NULL, last_used REAL NOT NULL
+                    )
+                """)
+                conn.execute("CREATE TABLE IF NOT EXISTS cache_meta (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        except sqlite3.Error as e:
+            print(f"⚠️ Query cache file unavailable, caching in memory only: {e}")
+            self.path = None
+    
+    def _connect(self) -> sqlite3.Connection:
+        # A short-lived connection per call keeps this safe across threads and forked workers
+        return sqlite3.connect(self.path, timeout=1.0)
+    
+    def get(self, key) -> Any:
+        """Return the value for ``key`` from memory or the cache file, or None if missing or expired."""
+        value = self._get_local(key)
+        if value is None and self.path is not None:
+            value = self._get_file(key)
+        self._count(value is not None)
+        return value
+    
+    def _get_file(self, key) -> Any:
+        """Read an unexpired entry from the cache file into memory; None if there isn't one."""
+        now = time.time()
+        try:
+            with self._connect() as conn:
+                row = conn.execute(f"SELECT value, stored_at FROM {self.table} WHERE key = ? AND stored_at > ?",
+                                   (key, now - self.ttl_seconds)).fetchone()
+                if row is None:
+                    return None
+                conn.execute(f"UPDATE {self.table} SET last_used = ? WHERE key = ?", (now, key))
+        except sqlite3.Error:
+            return None
+        
+        value = self.decode(row[0])
+        with self.lock:
+            # Keep the entry's original age so it expires at the same time in every worker
+            self.entries[key] = (time.monotonic() - (now - row[1]), value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return value
+    
+    def put(self, key, value):
+        """Store ``value`` in memory and in the cache file, trimming the file to the newest entries."""
+        super().put(key, value)
+        if self.path is None:
+            return
+        
+        now = time.time()
+        try:
+            with self._connect() as conn:
+                conn.execute(f"INSERT OR REPLACE INTO {self.table} VALUES (?, ?, ?, ?)",
+                             (key, self.encode(value), now, now))
+                conn.execute(f"DELETE FROM {self.table} WHERE stored_at <= ?", (now - self.ttl_seconds,))
+                conn.execute(f"""
+                    DELETE FROM {self.table} WHERE key NOT IN
+                        (SELECT key FROM {self.table} ORDER BY last_used DESC LIMIT ?)
+                """, (self.max_entries,))
+        except (sqlite3.Error, TypeError, ValueError) as e:
+            print(f"⚠️ Could not persist query cache entry: {e}")
+    
+    def clear(self):
+        """Drop every entry from memory and from the cache file."""
+        super().clear()
+        if self.path is None:
+            return
+        try:
+            with self._connect() as conn:
+                conn.execute(f"DELETE FROM {self.table}")
+        except sqlite3.Error as e:
+            print(f"⚠️ Could not clear query cache file: {e}")
+    
+    def bind_data_version(self, version: str) -> bool:
+        """Empty the cache if its entries were computed from another version of the data.
+        
+        The version is recorded in the cache file; returns True if the cache was emptied.
+        """
+        if self.path is None:
+            return False
+        name = f"{self.table}_data_version"
+        try:
+            with self._connect() as conn:
+                row = conn.execute("SELECT value FROM cache_meta WHERE name = ?", (name,)).fetchone()
+                if row is not None and row[0] == version:
+                    return False
+                conn.execute(f"DELETE FROM {self.table}")
+                conn.execute("INSERT OR REPLACE INTO cache_meta VALUES (?, ?)", (name, version))
+        except sqlite3.Error as e:
+            print(f"⚠️ Could not check query cache data version: {e}")
+            return False
+        super().clear()
+        return True
+    
+    def clear_memory(self):
+        """Drop the entries held in memory only; the cache file is left alone."""
+        super().clear()
+    
+    def generation(self) -> int:
+        """Return the clear counter recorded in the cache file (0 if there is none)."""
+        if self.path is None:
+            return 0
+        try:
+            with self._connect() as conn:
+                row = conn.execute("SELECT value FROM cache_meta WHERE name = 'generation'").fetchone()
+        except sqlite3.Error:
+            return 0
+        return int(row[0]) if row is not None else 0
+    
+    def bump_generation(self) -> int:
+        """Increment the clear counter, telling every process sharing the file to drop its memory copies."""
+        if self.path is None:
+            return 0
+        try:
+            with self._connect() as conn:
+                conn.execute("""
+                    INSERT INTO cache_meta VALUES ('generation', '1')
+                    ON CONFLICT(name) DO UPDATE SET value = CAST(value AS INTEGER) + 1
+                """)
+                return int(conn.execute("SELECT value FROM cache_meta WHERE name = 'generation'").fetchone()[0])
+        except sqlite3.Error as e:
+            print(f"⚠️ Could not record cache clear: {e}")
+            return 0
+
+class SemanticQueryCache:
+    """NL2SQL result cache looked up by cosine similarity of question embeddings.
+    
+    Lookups run against an in-memory matrix. Each entry is also written to a table in
+    the shared query cache file when it is added, so restarted or newly forked workers
+    load what every worker has added, and no process overwrites another's entries.
+    """
+    
+    def __init__(self, path: str = QUERY_CACHE_PATH, threshold: float = SEMANTIC_CACHE_THRESHOLD,
+                 max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES, ttl_seconds: float = SEMANTIC_CACHE_TTL_SECONDS):
+        self.path = path
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.lock = threading.Lock()
+        
+        # Slot i of each array belongs to entries[i]. The vector matrix is a single
+        # preallocated C-contiguous block (allocated once the embedding size is known),
+        # so inserts never copy it and lookups are one contiguous matvec. Vectors are
+        # L2-normalised and stored as int8; vectors[i] / scales[i] recovers the embedding.
+        self.vectors = None
+        self.scales = np.ones(max_entries, dtype=np.float32)
+        self.created = np.zeros(max_entries)
+        self.last_used = np.zeros(max_entries)
+        self.entries = []
+        try:
+            with self._connect() as conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS semantic_cache (
+                        question TEXT PRIMARY KEY, vector BLOB NOT NULL, scale REAL NOT NULL,
+                        created REAL NOT NULL, entry TEXT NOT NULL
+                    )
+                """)
+        except sqlite3.Error as e:
+            print(f"⚠️ Semantic cache file unavailable, caching in memory only: {e}")
+            self.path = None
+        self.load()
+    
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=1.0)
+    
+    def __len__(self) -> int:
+        return len(self.entries)
+    
+    def lookup(self, vector: np.ndarray) -> Optional[Dict[str, Any]]:
+        """Return the cached result closest to ``vector`` if it clears the similarity threshold."""
+        with self.lock:
+            size = len(self.entries)
+            if not size:
+                return None
+            
+            now = time.time()
+            # Only the stored side is quantized; the query stays float32
+            sims = (self.vectors[:size] @ vector) / self.scales[:size]
+            sims[self.created[:size] < now - self.ttl_seconds] = -1.0
+            best = int(np.argmax(sims))
+            if sims[best] < self.threshold:
+                return None
+            
+            self.last_used[best] = now
+            entry = self.entries[best]
+            return {**entry, 'cached': True, 'matched_question': entry['question'],
+                    'similarity': float(sims[best])}
+    
+    def add(self, vector: np.ndarray, result: Dict[str, Any]):
+        """Store a result under its question embedding, reusing an expired or the least recently used slot when full."""
+        with self.lock:
+            now = time.time()
+            if self.vectors is None:
+                self.vectors = np.zeros((self.max_entries, vector.shape[0]), dtype=np.int8)
+            
+            size = len(self.entries)
+            if size < self.max_entries:
+                slot = size
+                self.entries.append(result)
+            else:
+                expired = self.created < now - self.ttl_seconds
+                slot = int(np.argmax(expired)) if expired.any() else int(np.argmin(self.last_used))
+                self.entries[slot] = result
+            
+            self.vectors[slot], self.scales[slot] = self._quantize(vector)
+            self.created[slot] = now
+            self.last_used[slot] = now
+            quantized, scale = self.vectors[slot].tobytes(), float(self.scales[slot])
+        
+        if self.path is None:
+            return
+        try:
+            with self._connect() as conn:
+                conn.execute("INSERT OR REPLACE INTO semantic_cache VALUES (?, ?, ?, ?, ?)",
+                             (result['question'].lower(), quantized, scale, now, _dumps_json(result)))
+                conn.execute("DELETE FROM semantic_cache WHERE created <= ?", (now - self.ttl_seconds,))
+                conn.execute("""
+                    DELETE FROM semantic_cache WHERE question NOT IN
+                        (SELECT question FROM semantic_cache ORDER BY created DESC LIMIT ?)
+                """, (self.max_entries,))
+        except (sqlite3.Error, TypeError, ValueError) as e:
+            print(f"⚠️ Could not persist semantic cache entry: {e}")
+    
+    def clear(self):
+        """Drop every entry, including the copies in the cache file."""
+        with self.lock:
+            if self.path is not None:
+                try:
+                    with self._connect() as conn:
+                        conn.execute("DELETE FROM semantic_cache")
+                except sqlite3.Error as e:
+                    print(f"⚠️ Could not clear semantic cache file: {e}")
+            self._reset()
+    
+    def reload(self):
+        """Replace the entries held in memory with the ones in the cache file."""
+        with self.lock:
+            self._reset()
+            self.load()
+    
+    def _reset(self):
+        self.vectors = None
+        self.entries = []
+        self.scales[:] = 1.0
+        self.created[:] = 0.0
+        self.last_used[:] = 0.0
+    
+    @staticmethod
+    def _quantize(vectors: np.ndarray):
+        """Scale each vector so its largest component maps to ±127 and round to int8; returns (int8 values, scales)."""
+        scales = 127.0 / np.abs(vectors).max(axis=-1)
+        quantized = np.rint(vectors * np.expand_dims(scales, -1)).astype(np.int8)
+        return quantized, scales.astype(np.float32)
+    
+    def load(self):
+        """Load the unexpired entries saved by any worker so a restart doesn't start cold."""
+        if self.path is None:
+            return
+        try:
+            with self._connect() as conn:
+                rows = conn.execute("""
+                    SELECT vector, scale, created, entry FROM semantic_cache
+                    WHERE created > ? ORDER BY created DESC LIMIT ?
+                """, (time.time() - self.ttl_seconds, self.max_entries)).fetchall()
+            if not rows:
+                return
+            size = len(rows)
+            self.vectors = np.zeros((self.max_entries, len(rows[0][0])), dtype=np.int8)
+            self.vectors[:size] = np.frombuffer(b''.join(row[0] for row in rows), dtype=np.int8).reshape(size, -1)
+            self.scales[:size] = [row[1] for row in rows]
+            self.created[:size] = [row[2] for row in rows]
+            self.last_used[:size] = self.created[:size]
+            self.entries = [json.loads(row[3]) for row in rows]
+            print(f"   Semantic cache: loaded {len(self.entries)} entries from {self.path}")
+        except (sqlite3.Error, ValueError) as e:
+            print(f"⚠️ Could not load semantic cache from {self.path}: {e}")
+            self.vectors, self.entries = None, []
+
+class EmbeddingBatcher:
+    """Coalesces concurrent single-text embedding calls into batched requests.
+    
+    A background thread sends everything queued when it wakes (up to ``max_batch`` texts)
+    as one request. A lone question goes out immediately; under load, questions that
+    arrive during a request share the next one instead of each paying a round trip.
+    """
+    
+    def __init__(self, embed: Callable[[List[str]], List[List[float]]], max_batch: int = EMBEDDING_COALESCE_MAX):
+        self.embed = embed
+        self.max_batch = max_batch
+        self.pending = queue.Queue()
+        threading.Thread(target=self._run, daemon=True, name='embedding-batcher').start()
+    
+    def embed_one(self, text: str) -> List[float]:
+        """Return the embedding of ``text``, raising whatever the batched request raised."""
+        future = Future()
+        self.pending.put((text, future))
+        return future.result()
+    
+    def _run(self):
+        while True:
+            batch = [self.pending.get()]
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self.pending.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                embeddings = self.embed([text for text, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), embedding in zip(batch, embeddings):
+                future.set_result(embedding)
+
+class StageTimer:
+    """Wall-clock time spent in each stage of the request on the current thread, for a Server-Timing header."""
+    
+    def __init__(self):
+        self._local = threading.local()
+    
+    def start(self):
+        """Begin recording stages for a request on this thread."""
+        self._local.stages = []
+    
+    @contextmanager
+    def stage(self, name: str):
+        started = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            stages = getattr(self._local, 'stages', None)
+            if stages is not None:
+                stages.append((name, time.perf_counter_ns() - started))
+    
+    def server_timing(self) -> str:
+        """Return the recorded stages as a Server-Timing value (milliseconds) and stop recording."""
+        stages = getattr(self._local, 'stages', None) or []
+        self._local.stages = None
+        return ', '.join(f"{name};dur={elapsed / 1e6:.1f}" for name, elapsed in stages)
+
 class JosysOpenAINLP:
     """NLP interface using OpenAI for NL2SQL and embeddings."""
     
     def __init__(self, db_path: str = 'josys_data.db'):
         self.db_path = db_path
-        self.conn = sqlite3.connect(db_path, check_same_thread=False)
-        self.conn.row_factory = sqlite3.Row
+        
+        # The service never writes to the database: indexes and planner statistics are
+        # built by csv_to_sqlite.py. This connection reads schema and fingerprint data;
+        # queries run on per-thread connections so concurrent requests don't share a lock.
+        self.meta_conn = self._open_meta_conn()
+        self._local = threading.local()
+        self._db_generation = 0
+        self._db_signature = self._database_signature()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(before=self._before_fork, after_in_child=self._after_fork)
         
         # Load OpenAI API key from .env file
         load_dotenv()
@@ -31,26 +784,270 @@ class JosysOpenAINLP:
             raise ValueError("❌ OpenAI API key not found in .env file! Please add OPENAI_API_KEY=your_key_here to .env")
         
         # Initialize OpenAI client
-        self.openai_client = openai.OpenAI(api_key=self.api_key)
+        self.openai_client = self._create_openai_client()
+        self.embedding_batcher = EmbeddingBatcher(self._create_embeddings)
         
         # Cache for embeddings and results
-        self.embedding_cache = {}
-        self.query_cache = {}
+        self.embedding_cache = PersistentQueryCache(max_entries=EMBEDDING_CACHE_MAX_ENTRIES,
+                                                    ttl_seconds=EMBEDDING_CACHE_TTL_SECONDS,
+                                                    table='embedding_cache', encode=_encode_vector,
+                                                    decode=_decode_vector)
+        # Vectors from another embedding model are not comparable, so a model change empties it
+        self.embedding_cache.bind_data_version(EMBEDDING_MODEL)
+        self.query_cache = PersistentQueryCache()
+        self.completion_cache = PersistentQueryCache(max_entries=COMPLETION_CACHE_MAX_ENTRIES,
+                                                     ttl_seconds=COMPLETION_CACHE_TTL_SECONDS,
+                                                     table='completion_cache')
+        self.analysis_cache = BoundedCache(ANALYSIS_CACHE_MAX_ENTRIES)
+        self.plan_cache = BoundedCache(PLAN_CACHE_MAX_ENTRIES)
+        self.semantic_cache = SemanticQueryCache()
+        
+        # Answers cached before the database was rebuilt (csv_to_sqlite.py) must not be served
+        self.data_version = self._data_fingerprint()
+        if self.query_cache.bind_data_version(self.data_version):
+            self.semantic_cache.clear()
+            print("   Answer caches reset for the current data")
+        self._cache_generation = self.query_cache.generation()
+        self._cache_checked_at = time.monotonic()
+        self._sync_lock = threading.Lock()
+        self.analysis_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='analysis')
+        self.openai_semaphore = threading.BoundedSemaphore(OPENAI_MAX_CONCURRENT_REQUESTS)
+        self._in_flight = {}
+        self._in_flight_lock = threading.Lock()
+        self.timings = StageTimer()
+        self._warm_thread = threading.Thread(target=self._warm_up, daemon=True)
+        self._warm_thread.start()
         
         print("🤖 OpenAI NLP interface initialized successfully!")
         print(f"   Database: {db_path}")
         print(f"   OpenAI API: ✅ Connected")
         
         # Get schema info for SQL generation
-        self.schema_info = self._get_detailed_schema()
+        self._load_schema()
         print(f"   Schema loaded: {len(self.schema_info.split('Table:')) - 1} tables")
     
+    def _load_schema(self):
+        """Read the schema prompt and the vocabularies the templates and plans rely on from the database."""
+        self.schema_info = self._get_detailed_schema()
+        self._system_prompt = self._build_system_prompt()
+        self.fts_tokenizers = self._detect_fts_tokenizers()
+        self.person_names = self._load_person_names()
+        self.device_cities = self._load_device_cities()
+    
+    def clear_caches(self):
+        """Empty the answer caches, in this worker and (via the cache file) in every other one."""
+        for cache in (self.query_cache, self.completion_cache, self.plan_cache, self.semantic_cache):
+            cache.clear()
+        self._cache_generation = self.query_cache.bump_generation()
+    
+    def _sync_caches(self):
+        """Catch up with changes made outside this worker since the last check.
+        
+        A rebuilt database (csv_to_sqlite.py replaces the file) is reopened, and the
+        answer caches are reset if its data differs. Answers held in memory are dropped
+        if another worker has cleared the caches.
+        """
+        now = time.monotonic()
+        if now - self._cache_checked_at < CACHE_SYNC_INTERVAL_SECONDS or not self._sync_lock.acquire(blocking=False):
+            return
+        try:
+            self._cache_checked_at = now
+            signature = self._database_signature()
+            if signature != self._db_signature:
+                self._db_signature = signature
+                self._reopen_database()
+            
+            generation = self.query_cache.generation()
+            if generation != self._cache_generation:
+                self._cache_generation = generation
+                self._clear_memory_caches()
+        finally:
+            self._sync_lock.release()
+    
+    def _clear_memory_caches(self):
+        self.query_cache.clear_memory()
+        self.completion_cache.clear_memory()
+        self.plan_cache.clear()
+        self.semantic_cache.reload()
+    
+    def _database_signature(self):
+        """Inode, size and mtime of the database file and its WAL; cheap to read and changes with the data.
+        
+        It also changes for WAL checkpoints, so a change only prompts a fingerprint check.
+        """
+        signature = []
+        for path in (self.db_path, f"{self.db_path}-wal"):
+            try:
+                stat = os.stat(path)
+                signature.append((stat.st_ino, stat.st_size, stat.st_mtime_ns))
+            except OSError:
+                signature.append(None)
+        return tuple(signature)
+    
+    def _reopen_database(self):
+        """Point every connection at the current database file and reset the caches if the data changed."""
+        old_conn, self.meta_conn = self.meta_conn, self._open_meta_conn()
+        old_conn.close()
+        # Each thread's read connection is reopened on its next use
+        self._db_generation += 1
+        loaded_version, self.data_version = self.data_version, self._data_fingerprint()
+        if self.data_version != loaded_version:
+            # Every worker holds its own schema prompt and name/city lists
+            self.analysis_cache.clear()
+            self._load_schema()
+        # Only the first worker to see the new data resets the shared cache file
+        if self.query_cache.bind_data_version(self.data_version):
+            self.semantic_cache.clear()
+            # Other workers notice the new generation and drop what they hold in memory
+            self._cache_generation = self.query_cache.bump_generation()
+            self._clear_memory_caches()
+            print("   Database changed on disk; answer caches reset")
+    
+    def _data_fingerprint(self) -> str:
+        """Identify the data in the database without scanning the tables.
+        
+        csv_to_sqlite.py records a hash of the table contents in build_info. Databases
+        built before that fall back to each table's row count and largest rowid.
+        """
+        try:
+            row = self.meta_conn.execute("SELECT value FROM build_info WHERE key = 'content_hash'").fetchone()
+            if row is not None:
+                return row[0]
+        except sqlite3.Error:
+            pass
+        shape = []
+        for table in ('devices', 'provisions', 'app_portfolio'):
+            try:
+                shape.append(tuple(self.meta_conn.execute(f"SELECT COUNT(*), MAX(rowid) FROM {table}").fetchone()))
+            except sqlite3.Error:
+                shape.append(None)
+        return hashlib.blake2b(repr(shape).encode('utf-8'), digest_size=16).hexdigest()
+    
+    def _before_fork(self):
+        """Let the warm-up thread finish so workers don't inherit its locks half-held."""
+        warm_thread = getattr(self, '_warm_thread', None)
+        if warm_thread is not None:
+            warm_thread.join(timeout=60)
+    
+    def _after_fork(self):
+        """Give a forked worker (e.g. gunicorn --preload) its own SQLite handles and cache locks.
+        
+        SQLite connections must not be used across fork(), and a lock held by another
+        thread at fork time would never be released in the child.
+        """
+        self.meta_conn = self._open_meta_conn()
+        self._local = threading.local()
+        # Pooled HTTPS connections are sockets too; the worker opens its own.
+        # Threads don't survive fork(), so the batcher is started again.
+        self.openai_client = self._create_openai_client()
+        self.embedding_batcher = EmbeddingBatcher(self._create_embeddings)
+        threading.Thread(target=self._warm_openai_connection, daemon=True).start()
+        self.analysis_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='analysis')
+        self.openai_semaphore = threading.BoundedSemaphore(OPENAI_MAX_CONCURRENT_REQUESTS)
+        self._in_flight = {}
+        self._in_flight_lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        for cache in (self.embedding_cache, self.query_cache, self.completion_cache, self.analysis_cache,
+                      self.plan_cache, self.semantic_cache):
+            cache.lock = threading.Lock()
+    
+    def _create_openai_client(self) -> openai.OpenAI:
+        """Create the OpenAI client, keeping pooled connections alive between questions.
+        
+        A question arriving after a short pause otherwise pays DNS and a TLS handshake
+        again. HTTP/2 is used when the h2 package is installed, so concurrent requests
+        share one connection.
+        """
+        http_client = None
+        if httpx is not None and issubclass(getattr(openai, 'DefaultHttpxClient', type(None)), httpx.Client):
+            http_client = openai.DefaultHttpxClient(
+                http2=importlib.util.find_spec('h2') is not None,
+                limits=httpx.Limits(max_connections=OPENAI_MAX_CONCURRENT_REQUESTS * 2,
+                                    max_keepalive_connections=OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+                                    keepalive_expiry=OPENAI_KEEPALIVE_SECONDS))
+        return openai.OpenAI(api_key=self.api_key, http_client=http_client, timeout=OPENAI_TIMEOUT_SECONDS)
+    
+    def _open_meta_conn(self) -> sqlite3.Connection:
+        """Open the shared read-only connection used for schema and fingerprint reads."""
+        return sqlite3.connect(f"{Path(self.db_path).resolve().as_uri()}?mode=ro", uri=True,
+                               check_same_thread=False)
+    
+    def _get_read_conn(self) -> sqlite3.Connection:
+        """Return this thread's read-only connection, opening it on first use."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.db_generation != self._db_generation:
+            # The database file was replaced; this connection still reads the old one
+            conn.close()
+            conn = None
+        if conn is None:
+            # A large statement cache keeps the fixed keyword, breakdown and cross-reference
+            # statements compiled even when one-off generated queries pass through
+            conn = sqlite3.connect(f"{Path(self.db_path).resolve().as_uri()}?mode=ro", uri=True,
+                                   cached_statements=1000)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA cache_size=-64000")
+            conn.execute("PRAGMA mmap_size=268435456")
+            # DISTINCT / ORDER BY / COUNT(DISTINCT) build temp b-trees; keep them off disk
+            conn.execute("PRAGMA temp_store=MEMORY")
+            conn.set_authorizer(_authorize_read)
+            # Checked every few thousand VM steps; interrupts a query once its deadline passes
+            conn.set_progress_handler(self._past_deadline, 10000)
+            self._local.conn = conn
+            self._local.db_generation = self._db_generation
+        return conn
+    
+    def _past_deadline(self) -> int:
+        deadline = getattr(self._local, 'deadline', None)
+        return int(deadline is not None and time.monotonic() > deadline)
+    
+    @contextmanager
+    def _read_transaction(self):
+        """Run this thread's reads in one deferred transaction, so they share a single snapshot.
+        
+        Only reads made on this thread are covered. The analyses started by
+        _start_question_analyses run on analysis_executor threads with their own
+        connections, so they can see a different snapshot if the data changes meanwhile.
+        """
+        conn = self._get_read_conn()
+        if conn.in_transaction:
+            yield conn
+            return
+        conn.execute("BEGIN DEFERRED")
+        try:
+            yield conn
+        finally:
+            conn.commit()
+    
     def _get_detailed_schema(self) -> str:
+        """Get the schema description, reusing the on-disk copy while the table definitions are unchanged."""
+        # Keyed by the CREATE TABLE statements rather than the file's mtime, which also
+        # moves whenever indexes, statistics or WAL checkpoints touch the file
+        tables = [tuple(row) for row in self._get_read_conn().execute(
+            "SELECT name, sql FROM sqlite_master WHERE type = 'table' ORDER BY name")]
+        cache_key = [os.path.abspath(self.db_path), hashlib.sha256(repr(tables).encode('utf-8')).hexdigest()]
+        try:
+            with open(SCHEMA_CACHE_PATH) as f:
+                cached = json.load(f)
+            if cached.get('key') == cache_key:
+                return cached['schema']
+        except (OSError, ValueError):
+            pass
+        
+        schema = self._build_detailed_schema()
+        try:
+            os.makedirs(os.path.dirname(SCHEMA_CACHE_PATH), exist_ok=True)
+            with open(SCHEMA_CACHE_PATH, 'w') as f:
+                json.dump({'key': cache_key, 'schema': schema}, f)
+        except OSError as e:
+            print(f"⚠️ Could not cache schema to {SCHEMA_CACHE_PATH}: {e}")
+        return schema
+    
+    def _build_detailed_schema(self) -> str:
         """Get detailed database schema for SQL generation."""
         schema_parts = []
         
         # Get devices table schema
-        devices_info = self.conn.execute("PRAGMA table_info(devices)").fetchall()
+        devices_info = self._get_read_conn().execute("PRAGMA table_info(devices)").fetchall()
         schema_parts.append("Table: devices")
         schema_parts.append("Description: IT assets (laptops, computers, phones) with assignment information")
         schema_parts.append("Columns:")
@@ -58,7 +1055,7 @@ class JosysOpenAINLP:
             schema_parts.append(f"  - {col[1]} ({col[2]}) - {self._get_column_description('devices', col[1])}")
         
         # Get provisions table schema  
-        provisions_info = self.conn.execute("PRAGMA table_info(provisions)").fetchall()
+        provisions_info = self._get_read_conn().execute("PRAGMA table_info(provisions)").fetchall()
         schema_parts.append("\nTable: provisions")
         schema_parts.append("Description: User access to applications and services")
         schema_parts.append("Key User Columns:")
@@ -79,7 +1076,7 @@ class JosysOpenAINLP:
         schema_parts.append("Application values: 'Activated', 'Invited', '' (empty for no access)")
         
         # Get app_portfolio table schema
-        portfolio_info = self.conn.execute("PRAGMA table_info(app_portfolio)").fetchall()
+        portfolio_info = self._get_read_conn().execute("PRAGMA table_info(app_portfolio)").fetchall()
         schema_parts.append("\nTable: app_portfolio")
         schema_parts.append("Description: Detailed application access with roles, costs, and account information")
         schema_parts.append("Columns:")
@@ -95,62 +1092,15 @@ class JosysOpenAINLP:
     
     def _get_column_description(self, table: str, column: str) -> str:
         """Get human-readable description for database columns."""
-        descriptions = {
-            'devices': {
-                'Asset_Number': 'Unique device identifier',
-                'Device_Type': 'Type of device (Laptop, Computer, etc.)',
-                'Manufacturer': 'Device manufacturer (Apple, Dell, etc.)',
-                'Model_Name': 'Specific model name',
-                'Device_Status': 'Current status (Available, Assigned, etc.)',
-                'Assigned_User_s_Email': 'Email of user assigned to device',
-                'Assigned_User_s_ID': 'User ID of assigned user',
-                'City': 'Location city',
-                'Region': 'Geographic region'
-            },
-            'provisions': {
-                'User_ID': 'Unique user identifier',
-                'First_Name': 'User first name',
-                'Last_Name': 'User last name', 
-                'Email': 'User email address',
-                'Role': 'Job role/title',
-                'Status': 'User status (Active, Inactive)',
-                'Work_Location_Code': 'Office location code'
-            },
-            'app_portfolio': {
-                'App': 'Application name (e.g., AWS, GitHub, Slack)',
-                'Identifier': 'Application instance/account identifier',
-                'ID': 'Username/login ID for the application (e.g., email or account name)',
-                'Account_Status': 'Account status (Activated, Invited, etc.)',
-                'Monthly_Expense': 'Monthly cost for this access',
-                'Role_s': 'User roles/permissions in the application',
-                'Additional_Information': 'Extra details about the access',
-                'First_Name': 'User first name',
-                'Last_Name': 'User last name',
-                'User_Status': 'User account status',
-                'Email': 'User email address',
-                'User_ID': 'Unique user identifier',
-                'User_Category': 'User type (Full-time, Contractor, etc.)',
-                'Department_s': 'User department',
-                'Job_Title': 'User job title',
-                'Role': 'User organizational role'
-            }
-        }
-        
-        return descriptions.get(table, {}).get(column, 'Data field')
+        return _COLUMN_DESCRIPTIONS.get(table, {}).get(column, 'Data field')
     
-    def natural_language_to_sql(self, question: str) -> Dict[str, Any]:
-        """Convert natural language question to SQL using OpenAI."""
-        start_time = time.time()
-        
-        # Check cache first
-        cache_key = f"nl2sql:{question.lower()}"
-        if cache_key in self.query_cache:
-            cached = self.query_cache[cache_key].copy()
-            cached['cached'] = True
-            return cached
+    def _build_system_prompt(self) -> str:
+        """Build the NL2SQL system prompt (schema, guidelines and examples).
         
-        # Create detailed prompt for OpenAI
-        prompt = f"""You are an expert SQL developer for a Josys IT asset management system.
+        It is identical for every request, so OpenAI's prompt caching can reuse it;
+        only the question goes in the user message.
+        """
+        return f"""You are an expert SQL developer for a Josys IT asset management system.
 
 DATABASE SCHEMA:
 {self.schema_info}
@@ -199,86 +1149,441 @@ CROSS-TABLE JOIN EXAMPLES:
 - "users with Apple devices and GitHub access" → SELECT p.First_Name, p.Last_Name, d.Asset_Number, d.Manufacturer, p.GitHub FROM provisions p JOIN devices d ON p.Email = d.Assigned_User_s_Email WHERE UPPER(d.Manufacturer) LIKE '%APPLE%' AND p.GitHub = 'Activated' LIMIT 20
 - "users with devices and detailed AWS access" → SELECT DISTINCT d.Asset_Number, d.Device_Type, ap.First_Name, ap.Last_Name, ap.App, ap.Identifier, ap.Role_s FROM devices d JOIN app_portfolio ap ON d.Assigned_User_s_Email = ap.Email WHERE UPPER(ap.App) LIKE UPPER('%aws%') AND ap.Account_Status = 'Activated' LIMIT 20
 
-USER QUESTION: {question}
-
-Generate ONLY the SQL query (no explanations):"""
+Generate ONLY the SQL query for the user question (no explanations)."""
+    
+    def natural_language_to_sql(self, question: str,
+                                on_results: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """Convert natural language question to SQL using OpenAI.
+        
+        ``on_results`` is called with the rows as soon as the SQL has run, before the
+        insights are added; it is not called for cached answers.
+        """
+        start_time = time.perf_counter()
+        self._sync_caches()
+        
+        # Check cache first. Cached results are shared and must not be mutated;
+        # callers get a shallow copy so top-level keys can be overridden safely.
+        cache_key = f"nl2sql:{question.lower()}"
+        with self.timings.stage('cache'):
+            cached = self.query_cache.get(cache_key)
+        if cached is not None:
+            return {**cached, 'cached': True}
+        
+        # Concurrent requests for the same question share one OpenAI call and query
+        with self._in_flight_lock:
+            pending = self._in_flight.get(cache_key)
+            is_leader = pending is None
+            if is_leader:
+                pending = self._in_flight[cache_key] = Future()
+        
+        if not is_leader:
+            return {**pending.result(), 'cached': True}
+        
+        try:
+            result = self._answer_question(question, cache_key, start_time, on_results)
+            pending.set_result(result)
+            return result
+        except BaseException as e:
+            pending.set_exception(e)
+            raise
+        finally:
+            with self._in_flight_lock:
+                del self._in_flight[cache_key]
+    
+    def _answer_question(self, question: str, cache_key: str, start_time: float,
+                         on_results: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """Generate and run the SQL for a question that missed the exact-match cache."""
+        # Template-shaped questions are answered without calling OpenAI; a template that
+        # finds nothing (e.g. a name it misread) leaves the question to the model
+        analyses = None
+        template_match = self._match_sql_template(question)
+        if template_match is not None:
+            sql_query, params = template_match
+            analyses = self._start_question_analyses(question)
+            result = self._run_sql(question, cache_key, sql_query, params, 'template_match', start_time,
+                                   analyses, on_results=on_results, require_rows=True)
+            if result['count'] > 0 or result['status'] != 'success':
+                return result
+        
+        # Questions that differ from an earlier one only in the person named reuse its SQL
+        plan_key = self._question_plan_key(question)
+        if plan_key is not None:
+            plan = self.plan_cache.get(plan_key[0])
+            if plan is not None:
+                sql_query, slots = plan
+                if analyses is None:
+                    analyses = self._start_question_analyses(question)
+                return self._run_sql(question, cache_key, sql_query, self._plan_params(slots, plan_key[1]),
+                                     'plan_cache', start_time, analyses, on_results=on_results)
+        
+        # Paraphrases of earlier questions are answered from the semantic cache
+        question_vector = self._embed_question(question)
+        if question_vector is not None:
+            semantic_hit = self.semantic_cache.lookup(question_vector)
+            # Questions naming different people embed almost identically ("arvind" / "aravind"),
+            # so an answer is only reused for a question about the same people
+            if semantic_hit is not None and (self._question_names(semantic_hit['matched_question'])
+                                             != self._question_names(question)):
+                semantic_hit = None
+            if semantic_hit is not None:
+                # Repeats of this exact wording then skip the similarity search
+                self.query_cache.put(cache_key, semantic_hit)
+                return semantic_hit
+        
+        # The component analyses depend only on the question, so their queries
+        # run while OpenAI generates the SQL
+        if analyses is None:
+            analyses = self._start_question_analyses(question)
 
         try:
-            # Call OpenAI API
-            response = self.openai_client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "You are an expert SQL developer. Generate only SQL queries, no explanations."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=300,
-                temperature=0.1
-            )
-            
-            sql_query = response.choices[0].message.content.strip()
-            
-            # Clean up the SQL query
-            sql_query = sql_query.replace('```sql', '').replace('```', '').strip()
-            if sql_query.startswith('sql'):
-                sql_query = sql_query[3:].strip()
-            
-            # Execute the query
-            try:
-                cursor = self.conn.execute(sql_query)
-                results = [dict(row) for row in cursor.fetchall()]
-                
-                execution_time = time.time() - start_time
-                
-                result = {
-                    'question': question,
-                    'sql': sql_query,
-                    'results': results,
-                    'count': len(results),
-                    'execution_time': execution_time,
-                    'method': 'openai_nl2sql',
-                    'status': 'success',
-                    'cached': False
+            # Structured output returns {"sql": "..."}, so there are no code fences or
+            # trailing explanations to strip from the reply
+            messages = [
+                {"role": "system", "content": self._system_prompt},
+                {"role": "user", "content": f"USER QUESTION: {question}\n\nGenerate ONLY the SQL query (no explanations):"}
+            ]
+            for attempt in range(NL2SQL_MAX_RETRIES + 1):
+                request = {
+                    'model': NL2SQL_MODEL,
+                    'messages': messages,
+                    'max_tokens': 300,
+                    'temperature': 0,
+                    'response_format': SQL_RESPONSE_FORMAT
                 }
+                reply = self._complete(**request)
                 
-                # Add comprehensive insights and analysis
-                enhanced_result = self._generate_comprehensive_insights(question, result)
-                
-                # Cache the result
-                self.query_cache[cache_key] = enhanced_result.copy()
-                
-                return enhanced_result
+                sql_query = json.loads(reply)["sql"].strip()
+                result = self._run_sql(question, cache_key, sql_query, (), 'openai_nl2sql', start_time, analyses,
+                                       question_vector, on_results)
+                if result['status'] == 'success':
+                    self._remember_completion(request, reply)
+                # A query that hit the time limit would only burn another one
+                if result['status'] != 'sql_error' or 'interrupted' in result['error']:
+                    break
+                messages = messages + [
+                    {"role": "assistant", "content": reply},
+                    {"role": "user", "content": f"That query failed with: {result['error']}\nReturn a corrected SQL query."}
+                ]
+            
+            if plan_key is not None and result['status'] == 'success':
+                self._learn_plan(plan_key, sql_query)
+            return result
                 
+        except Exception as e:
+            return {
+                'question': question,
+                'error': f"OpenAI API error: {str(e)}",
+                'status': 'api_error',
+                'execution_time': time.perf_counter() - start_time
+            }
+    
+    @staticmethod
+    def _completion_key(request: Dict[str, Any]) -> Optional[str]:
+        """Completion cache key for a request; None unless it is deterministic (temperature 0)."""
+        if request.get('temperature') != 0:
+            return None
+        return hashlib.blake2b(_dumps_json(request).encode('utf-8'), digest_size=16).hexdigest()
+    
+    def _complete(self, **request) -> str:
+        """Return the reply text of a chat completion, reusing a remembered reply to an identical request."""
+        key = self._completion_key(request)
+        if key is not None:
+            cached = self.completion_cache.get(key)
+            if cached is not None:
+                return cached
+        
+        with self.timings.stage('openai'), self.openai_semaphore:
+            response = self.openai_client.chat.completions.create(**request)
+        return response.choices[0].message.content
+    
+    def _remember_completion(self, request: Dict[str, Any], reply: str):
+        """Cache a reply once its SQL has run, so a reply whose SQL failed is never replayed."""
+        key = self._completion_key(request)
+        if key is not None:
+            self.completion_cache.put(key, reply)
+    
+    def _match_sql_template(self, question: str):
+        """Return (sql, params) for the first SQL template the whole question matches, or None."""
+        question_text = question.strip().lower()
+        for pattern, sql_query in _SQL_TEMPLATES:
+            match = pattern.fullmatch(question_text)
+            if match is None:
+                continue
+            params = match.groupdict()
+            # "devices in india" or "devices in repair" are not city lookups
+            if 'city' in params and params['city'] not in self.device_cities:
+                continue
+            return sql_query, params
+        return None
+    
+    def _load_device_cities(self) -> frozenset:
+        """Lower-cased device cities, so the city template only answers questions naming one."""
+        try:
+            rows = self.meta_conn.execute("SELECT DISTINCT LOWER(City) FROM devices WHERE City != ''").fetchall()
+        except sqlite3.Error as e:
+            print(f"⚠️ Could not load device cities: {e}")
+            return frozenset()
+        return frozenset(city for (city,) in rows)
+    
+    def _load_person_names(self) -> frozenset:
+        """Lower-cased first and last names from provisions, used to spot people named in questions.
+        
+        Service accounts are named after apps and roles ("AWS", "System Admin"), so words that
+        also occur in the schema or the question keywords are not treated as names.
+        """
+        try:
+            rows = self.meta_conn.execute(
+                "SELECT LOWER(First_Name) FROM provisions UNION SELECT LOWER(Last_Name) FROM provisions").fetchall()
+        except sqlite3.Error as e:
+            print(f"⚠️ Could not load person names: {e}")
+            return frozenset()
+        vocabulary = set(_QUESTION_WORD.findall(self.schema_info.lower())) | _QUESTION_KEYWORDS
+        return frozenset(name for (name,) in rows
+                         if name and len(name) >= 3 and name.isalpha() and name not in vocabulary)
+    
+    def _question_plan_key(self, question: str):
+        """Return (template, names) with the person names in the question replaced by {name}, or None."""
+        names = []
+        
+        def placeholder(match):
+            if match.group(0) in self.person_names:
+                names.append(match.group(0))
+                return '{name}'
+            return match.group(0)
+        
+        template = _QUESTION_WORD.sub(placeholder, question.strip().lower())
+        return (template, tuple(names)) if names else None
+    
+    def _question_names(self, question: str) -> frozenset:
+        """Return the person names mentioned in the question."""
+        plan_key = self._question_plan_key(question)
+        return frozenset(plan_key[1]) if plan_key is not None else frozenset()
+    
+    def _learn_plan(self, plan_key, sql_query: str):
+        """Cache generated SQL as a plan, with the string literals holding the question's names turned into parameters.
+        
+        Nothing is cached unless every name appears only inside literals (one name per
+        literal), so a plan never runs with a stale name baked in.
+        """
+        template, names = plan_key
+        slots = []
+        
+        def parameterize(match):
+            value = match.group(0)[1:-1].replace("''", "'")
+            hits = [(index, name) for index, name in enumerate(names) if name in value.lower()]
+            if not hits:
+                return match.group(0)
+            index, name = hits[0]
+            if len(hits) > 1 or value.lower().count(name) > 1:
+                raise ValueError("literal holds more than one name")
+            start = value.lower().index(name)
+            written = value[start:start + len(name)]
+            case = next((case for case in (str.lower, str.upper, str.title) if case(written) == written), None)
+            if case is None:
+                raise ValueError("unrecognised name casing")
+            slots.append((value[:start], value[start + len(name):], case, index))
+            return f":p{len(slots) - 1}"
+        
+        try:
+            sql_template = _SQL_STRING_LITERAL.sub(parameterize, sql_query)
+        except ValueError:
+            return
+        if {slot[3] for slot in slots} != set(range(len(names))):
+            return
+        if any(name in sql_template.lower() for name in names):
+            return
+        self.plan_cache.put(template, (sql_template, slots))
+    
+    @staticmethod
+    def _plan_params(slots: list, names: tuple) -> Dict[str, str]:
+        """Bind a cached plan's parameters to the names in the current question."""
+        return {f"p{i}": prefix + case(names[index]) + suffix for i, (prefix, suffix, case, index) in enumerate(slots)}
+    
+    def _run_sql(self, question: str, cache_key: str, sql_query: str, params, method: str, start_time: float,
+                 analyses: Dict[str, Future], question_vector: Optional[np.ndarray] = None,
+                 on_results: Optional[Callable[[Dict[str, Any]], None]] = None,
+                 require_rows: bool = False) -> Dict[str, Any]:
+        """Execute generated SQL, add insights, and cache the successful result.
+        
+        With ``require_rows`` an empty answer is returned bare (no insights, not cached)
+        so the caller can try another route.
+        """
+        # The answer and any insight queries run on this thread read one snapshot (not
+        # the background analyses, which use their own threads' connections)
+        with self._read_transaction() as conn:
+            self._local.deadline = time.monotonic() + GENERATED_SQL_TIMEOUT_SECONDS
+            try:
+                with self.timings.stage('sql'):
+                    cursor = conn.execute(sql_query, params)
+                    # One row past the cap tells a full answer apart from a truncated one
+                    results = self._rows_to_dicts(cursor, MAX_RESULT_ROWS + 1)
+                    cursor.close()
             except sqlite3.Error as e:
                 return {
                     'question': question,
                     'sql': sql_query,
                     'error': f"SQL execution error: {str(e)}",
                     'status': 'sql_error',
-                    'execution_time': time.time() - start_time
+                    'execution_time': time.perf_counter() - start_time
                 }
-                
-        except Exception as e:
-            return {
+            finally:
+                self._local.deadline = None
+            
+            truncated = len(results) > MAX_RESULT_ROWS
+            if truncated:
+                results.pop()
+            if require_rows and not results:
+                return {'question': question, 'sql': sql_query, 'results': [], 'count': 0, 'status': 'success'}
+            
+            execution_time = time.perf_counter() - start_time
+            
+            result = {
                 'question': question,
-                'error': f"OpenAI API error: {str(e)}",
-                'status': 'api_error',
-                'execution_time': time.time() - start_time
+                'sql': sql_query,
+                'results': results,
+                'count': len(results),
+                'execution_time': execution_time,
+                'method': method,
+                'status': 'success',
+                'cached': False
             }
+            if params:
+                result['sql_params'] = params
+            if truncated:
+                result['truncated'] = True
+            
+            if on_results is not None:
+                on_results(result)
+            
+            # Add comprehensive insights and analysis
+            with self.timings.stage('insights'):
+                enhanced_result = self._generate_comprehensive_insights(question, result, analyses)
+        
+        # Cache the result
+        self.query_cache.put(cache_key, enhanced_result)
+        if question_vector is not None:
+            self.semantic_cache.add(question_vector, enhanced_result)
+        
+        return enhanced_result
+    
+    @staticmethod
+    def _rows_to_dicts(cursor: sqlite3.Cursor, max_rows: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Build result dicts straight from the cursor, without an intermediate list of Row objects.
+        
+        At most ``max_rows`` rows are read; the rest are never fetched from SQLite.
+        """
+        cursor.row_factory = None
+        columns = [description[0] for description in cursor.description or ()]
+        
+        # Like dict(row), the first of several same-named columns (e.g. from SELECT * joins) wins
+        first_index = {}
+        for index, column in enumerate(columns):
+            first_index.setdefault(column, index)
+        rows = islice(cursor, max_rows)
+        if len(first_index) == len(columns):
+            return [dict(zip(columns, row)) for row in rows]
+        return [{column: row[index] for column, index in first_index.items()} for row in rows]
+    
+    def _embed_question(self, question: str) -> Optional[np.ndarray]:
+        """Embed a question with OpenAI and L2-normalise it; returns None if the call fails."""
+        key = question.lower()
+        vector = self.embedding_cache.get(key)
+        if vector is not None:
+            return vector
+        
+        try:
+            with self.timings.stage('embed'):
+                embedding = self.embedding_batcher.embed_one(question)
+        except Exception as e:
+            print(f"⚠️ Embedding error, skipping semantic cache: {e}")
+            return None
+        
+        vector = np.asarray(embedding, dtype=np.float32)
+        vector /= np.linalg.norm(vector)
+        self.embedding_cache.put(key, vector)
+        return vector
     
-    def combined_nlp_search(self, question: str) -> Dict[str, Any]:
-        """Combine NL2SQL with fallback keyword search."""
-        start_time = time.time()
+    def _create_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts in one request; embeddings are returned in input order."""
+        response = self.openai_client.embeddings.create(model=EMBEDDING_MODEL, input=texts)
+        return [item.embedding for item in response.data]
+    
+    async def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        """Embed many texts in concurrent batched requests; rows are L2-normalised and in input order."""
+        # Length-sorted batches keep the token count of each request uniform
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        chunks = [order[i:i + EMBEDDING_BATCH_SIZE] for i in range(0, len(order), EMBEDDING_BATCH_SIZE)]
+        semaphore = asyncio.Semaphore(EMBEDDING_CONCURRENCY)
+        
+        async with openai.AsyncOpenAI(api_key=self.api_key) as client:
+            async def embed_chunk(chunk: List[int]):
+                async with semaphore:
+                    return await client.embeddings.create(model=EMBEDDING_MODEL, input=[texts[i] for i in chunk])
+            
+            responses = await asyncio.gather(*[embed_chunk(chunk) for chunk in chunks])
+        
+        vectors = np.empty((len(texts), 0), dtype=np.float32)
+        for chunk, response in zip(chunks, responses):
+            batch = np.asarray([item.embedding for item in response.data], dtype=np.float32)
+            if vectors.shape[1] == 0:
+                vectors = np.empty((len(texts), batch.shape[1]), dtype=np.float32)
+            vectors[chunk] = batch
+        
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors
+    
+    def embed_questions(self, questions: List[str]) -> int:
+        """Batch-embed questions into the embedding cache (e.g. from query history); returns how many were new."""
+        missing = list(dict.fromkeys(q.lower() for q in questions if q.lower() not in self.embedding_cache))
+        if not missing:
+            return 0
+        
+        vectors = asyncio.run(self._embed_batch(missing))
+        for key, vector in zip(missing, vectors):
+            self.embedding_cache.put(key, vector)
+        return len(missing)
+    
+    def _warm_up(self):
+        self._warm_openai_connection()
+        self.warm_embedding_cache()
+    
+    def _warm_openai_connection(self):
+        """Open a pooled connection to the API with a free metadata request, so the first question skips the TLS handshake."""
+        try:
+            self.openai_client.models.retrieve(NL2SQL_MODEL)
+        except Exception as e:
+            print(f"⚠️ Could not warm OpenAI connection: {e}")
+    
+    def warm_embedding_cache(self):
+        """Embed the example questions so the first lookups for them skip the embedding round-trip."""
+        try:
+            count = self.embed_questions(WARMUP_QUESTIONS)
+            print(f"   Embedding cache: warmed with {count} example questions")
+        except Exception as e:
+            print(f"⚠️ Could not warm embedding cache: {e}")
+    
+    def combined_nlp_search(self, question: str,
+                            on_results: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """Combine NL2SQL with fallback keyword search.
+        
+        ``on_results`` receives the NL2SQL rows early when there are any (see natural_language_to_sql).
+        """
+        start_time = time.perf_counter()
+        
+        def on_nl2sql_results(result: Dict[str, Any]):
+            if result['count'] > 0:
+                on_results({**result, 'method': 'combined_nl2sql_primary'})
         
         # Try NL2SQL first (more accurate for structured queries)
-        nl2sql_result = self.natural_language_to_sql(question)
+        nl2sql_result = self.natural_language_to_sql(question, on_nl2sql_results if on_results else None)
         
         # If NL2SQL succeeds and has results, use it
         if nl2sql_result['status'] == 'success' and nl2sql_result['count'] > 0:
-            nl2sql_result['method'] = 'combined_nl2sql_primary'
-            return nl2sql_result
+            return {**nl2sql_result, 'method': 'combined_nl2sql_primary'}
         
         # Fallback to keyword search
-        fallback_result = self._keyword_fallback_search(question)
+        with self.timings.stage('fallback'):
+            fallback_result = self._keyword_fallback_search(question)
         fallback_result['method'] = 'combined_keyword_fallback'
         fallback_result['fallback_reason'] = f"NL2SQL failed: {nl2sql_result.get('error', 'No results')}"
         fallback_result['attempted_sql'] = nl2sql_result.get('sql', 'N/A')
@@ -287,24 +1592,18 @@ Generate ONLY the SQL query (no explanations):"""
     
     def _keyword_fallback_search(self, query: str, limit: int = 10) -> Dict[str, Any]:
         """Keyword-based fallback search."""
-        start_time = time.time()
+        start_time = time.perf_counter()
         results = []
         
         try:
             # Search devices with keyword matching
-            device_cursor = self.conn.execute("""
-                SELECT Asset_Number, Device_Type, Manufacturer, Model_Name, 
-                       Device_Status, Assigned_User_s_Email, City, Region
-                FROM devices 
-                WHERE UPPER(Asset_Number) LIKE UPPER(?) 
-                   OR UPPER(Device_Type) LIKE UPPER(?) 
-                   OR UPPER(Manufacturer) LIKE UPPER(?) 
-                   OR UPPER(Assigned_User_s_Email) LIKE UPPER(?)
-                   OR UPPER(City) LIKE UPPER(?)
-                LIMIT ?
-            """, [f'%{query}%'] * 5 + [limit//2])
+            device_rows = self._keyword_match_rows(
+                'devices',
+                'Asset_Number, Device_Type, Manufacturer, Model_Name, Device_Status, Assigned_User_s_Email, City, Region',
+                ['Asset_Number', 'Device_Type', 'Manufacturer', 'Assigned_User_s_Email', 'City'],
+                query, limit//2)
             
-            for row in device_cursor.fetchall():
+            for row in device_rows:
                 results.append({
                     'type': 'device',
                     'similarity': 0.8,
@@ -312,19 +1611,13 @@ Generate ONLY the SQL query (no explanations):"""
                 })
             
             # Search provisions with keyword matching
-            provision_cursor = self.conn.execute("""
-                SELECT User_ID, First_Name, Last_Name, Email, Role, Status,
-                       Work_Location_Code
-                FROM provisions 
-                WHERE UPPER(User_ID) LIKE UPPER(?) 
-                   OR UPPER(First_Name) LIKE UPPER(?) 
-                   OR UPPER(Last_Name) LIKE UPPER(?) 
-                   OR UPPER(Email) LIKE UPPER(?)
-                   OR UPPER(Role) LIKE UPPER(?)
-                LIMIT ?
-            """, [f'%{query}%'] * 5 + [limit//2])
+            provision_rows = self._keyword_match_rows(
+                'provisions',
+                'User_ID, First_Name, Last_Name, Email, Role, Status, Work_Location_Code',
+                ['User_ID', 'First_Name', 'Last_Name', 'Email', 'Role'],
+                query, limit//2)
             
-            for row in provision_cursor.fetchall():
+            for row in provision_rows:
                 results.append({
                     'type': 'user',
                     'similarity': 0.8,
@@ -334,7 +1627,7 @@ Generate ONLY the SQL query (no explanations):"""
         except Exception as e:
             print(f"❌ Keyword fallback error: {e}")
         
-        execution_time = time.time() - start_time
+        execution_time = time.perf_counter() - start_time
         
         return {
             'query': query,
@@ -345,15 +1638,88 @@ Generate ONLY the SQL query (no explanations):"""
             'status': 'success'
         }
     
-    def _generate_comprehensive_insights(self, question: str, result: dict) -> dict:
-        """Generate comprehensive insights and analysis for query results."""
+    def _keyword_match_rows(self, table: str, select_columns: str, match_columns: List[str],
+                            query: str, limit: int) -> list:
+        """Rows of ``table`` where any of ``match_columns`` contains ``query`` (case-insensitive).
+        
+        Uses the table's FTS5 index built by csv_to_sqlite.py when it is a trigram index,
+        and falls back to scanning with LIKE otherwise.
+        """
+        conn = self._get_read_conn()
+        
+        # Trigram phrases match substrings like LIKE does but need 3+ characters. A
+        # unicode61 index (older SQLite builds) only matches token prefixes, so "vind"
+        # would miss "Arvind"; those databases keep the LIKE scan.
+        if self.fts_tokenizers.get(table) == 'trigram' and len(query) >= 3:
+            phrase = '"' + query.replace('"', '""') + '"'
+            fts_query = f"{{{' '.join(match_columns)}}} : {phrase}"
+            return conn.execute(f"""
+                SELECT {select_columns}
+                FROM {table}
+                WHERE rowid IN (SELECT rowid FROM {table}_fts WHERE {table}_fts MATCH ?)
+                LIMIT ?
+            """, [fts_query, limit]).fetchall()
+        
+        # LIKE already ignores ASCII case (and SQLite's UPPER() only folds ASCII), so
+        # neither side needs wrapping in UPPER()
+        where = " OR ".join(f"{column} LIKE '%' || ?1 || '%'" for column in match_columns)
+        return conn.execute(f"SELECT {select_columns} FROM {table} WHERE {where} LIMIT ?2",
+                            [query, limit]).fetchall()
+    
+    def _detect_fts_tokenizers(self) -> Dict[str, str]:
+        """Map each table that has an FTS5 index to the index's tokenizer."""
+        tokenizers = {}
+        for table in ('devices', 'provisions'):
+            row = self._get_read_conn().execute(
+                "SELECT sql FROM sqlite_master WHERE name = ?", [f'{table}_fts']).fetchone()
+            if row is not None:
+                tokenizers[table] = 'trigram' if 'trigram' in row[0].lower() else 'unicode61'
+        return tokenizers
+    
+    def _cached_analysis(self, key, compute):
+        """Return compute() for ``key``, reusing the result while the data is unchanged.
+        
+        The analysis counts and cross-references only depend on the (read-only) data,
+        so repeated questions about the same slice reuse them. Entries are keyed by the
+        data fingerprint rather than the file's mtime (see _data_fingerprint). Cached
+        values are shared and must not be mutated.
+        """
+        cache_key = (key, self.data_version)
+        value = self.analysis_cache.get(cache_key)
+        if value is None:
+            value = compute()
+            if value is not None:
+                self.analysis_cache.put(cache_key, value)
+        return value
+    
+    def _start_question_analyses(self, question: str) -> Dict[str, Future]:
+        """Start the result-independent analyses for a question in the background."""
+        terms = _question_terms(question.lower())
+        analyses = {
+            'detailed_breakdown': self.analysis_executor.submit(
+                self._generate_detailed_breakdown_analysis, terms)
+        }
+        if self._is_complex_multi_criteria_query(terms):
+            analyses['breakdown_data'] = self.analysis_executor.submit(self._analyze_query_breakdown, terms)
+        return analyses
+    
+    def _generate_comprehensive_insights(self, question: str, result: dict,
+                                         analyses: Optional[Dict[str, Future]] = None) -> dict:
+        """Generate comprehensive insights and analysis for query results.
+        
+        ``analyses`` holds analyses already started by _start_question_analyses.
+        """
+        analyses = analyses or {}
         
         # Start with the base result
         enhanced_result = result.copy()
         
-        question_lower = question.lower()
+        terms = _question_terms(question.lower())
         results = result.get('results', [])
         count = result.get('count', 0)
+        # A capped answer's count is the cap, not the real total
+        truncated = result.get('truncated', False)
+        total = f"at least {count}" if truncated else str(count)
         
         # Initialize insights
         insights = []
@@ -365,26 +1731,32 @@ Generate ONLY the SQL query (no explanations):"""
             insights.append("❌ No results found matching your criteria.")
             
             # Provide breakdown analysis for complex queries
-            if self._is_complex_multi_criteria_query(question_lower):
-                breakdown_data = self._analyze_query_breakdown(question_lower)
+            if self._is_complex_multi_criteria_query(terms):
+                if 'breakdown_data' in analyses:
+                    breakdown_data = analyses['breakdown_data'].result()
+                else:
+                    breakdown_data = self._analyze_query_breakdown(terms)
                 insights.extend(self._generate_breakdown_insights(breakdown_data))
-                suggestions.extend(self._generate_alternative_suggestions(question_lower, breakdown_data))
+                suggestions.extend(self._generate_alternative_suggestions(terms, breakdown_data))
             
         elif count > 0:
-            insights.append(f"✅ Found {count} result{'s' if count != 1 else ''} matching your criteria.")
+            if result.get('truncated'):
+                insights.append(f"✅ Found more than {count} results matching your criteria; showing the first {count}.")
+            else:
+                insights.append(f"✅ Found {count} result{'s' if count != 1 else ''} matching your criteria.")
             
             # Add specific insights based on query type
-            if 'aws' in question_lower and 'admin' in question_lower:
-                insights.append(f"🔐 Security Note: {count} user{'s' if count != 1 else ''} with AWS administrative privileges found.")
+            if 'aws' in terms and 'admin' in terms:
+                insights.append(f"🔐 Security Note: {total} user{'s' if count != 1 else ''} with AWS administrative privileges found.")
                 
-            if 'japan' in question_lower or any(name in question_lower for name in ['tomoyo', 'mari', 'kohei']):
-                insights.append(f"🗾 Geographic Analysis: Identified {count} Japanese employee{'s' if count != 1 else ''} in the system.")
+            if terms & _JAPAN_QUESTION_TERMS:
+                insights.append(f"🗾 Geographic Analysis: Identified {total} Japanese employee{'s' if count != 1 else ''} in the system.")
                 
-            if 'laptop' in question_lower or 'device' in question_lower:
-                device_insights = self._analyze_device_results(results)
+            if 'laptop' in terms or 'device' in terms:
+                device_insights = self._analyze_device_results(results, truncated)
                 insights.extend(device_insights)
                 
-            if 'notion' in question_lower or 'license' in question_lower:
+            if 'notion' in terms or 'license' in terms:
                 license_insights = self._analyze_license_results(results)
                 insights.extend(license_insights)
         
@@ -396,11 +1768,14 @@ Generate ONLY the SQL query (no explanations):"""
             insights.append(f"⚡ Fast execution: {exec_time:.3f}s")
         
         # Generate comprehensive breakdown analysis
-        detailed_breakdown = self._generate_detailed_breakdown_analysis(question_lower, results)
+        if 'detailed_breakdown' in analyses:
+            detailed_breakdown = analyses['detailed_breakdown'].result()
+        else:
+            detailed_breakdown = self._generate_detailed_breakdown_analysis(terms)
         
         # Generate key findings and cross-references
-        key_findings = self._generate_key_findings(question_lower, results, breakdown_data)
-        cross_references = self._generate_cross_references(question_lower, breakdown_data)
+        key_findings = self._generate_key_findings(terms, results, breakdown_data, truncated)
+        cross_references = self._generate_cross_references(terms, breakdown_data)
         
         # Add enhanced result data
         enhanced_result.update({
@@ -410,69 +1785,72 @@ Generate ONLY the SQL query (no explanations):"""
             'suggestions': suggestions,
             'key_findings': key_findings,
             'cross_references': cross_references,
-            'analysis_type': self._determine_analysis_type(question_lower),
-            'comprehensive_summary': self._generate_summary(question, count, insights)
+            'analysis_type': self._determine_analysis_type(terms),
+            'comprehensive_summary': self._generate_summary(question, count, insights, truncated)
         })
         
         return enhanced_result
     
-    def _is_complex_multi_criteria_query(self, question_lower: str) -> bool:
+    def _is_complex_multi_criteria_query(self, terms: frozenset) -> bool:
         """Detect if this is a complex multi-criteria query that needs breakdown."""
-        criteria_count = 0
-        
-        # Check for different types of criteria
-        if any(hw in question_lower for hw in ['lenovo', 'apple', 'laptop', 'device']):
-            criteria_count += 1
-        if any(access in question_lower for access in ['aws', 'admin', 'administrator']):
-            criteria_count += 1
-        if any(app in question_lower for app in ['notion', 'github', 'slack', 'license']):
-            criteria_count += 1
-        if any(loc in question_lower for loc in ['japan', 'india', 'bangalore']):
-            criteria_count += 1
-            
+        # Count the different types of criteria (hardware, access, apps, location)
+        criteria_count = sum(1 for group in _CRITERIA_TERMS if terms & group)
         return criteria_count >= 2
     
-    def _analyze_query_breakdown(self, question_lower: str) -> dict:
+    # Component counts for the breakdown; the applicable ones run as scalar
+    # sub-selects of a single statement
+    BREAKDOWN_COUNT_SQL = {
+        'lenovo_users': '''
+            SELECT COUNT(DISTINCT Assigned_User_s_Email) 
+            FROM devices 
+            WHERE UPPER(Manufacturer) = 'LENOVO' AND Device_Status = 'In-use'
+            AND Assigned_User_s_Email IS NOT NULL AND Assigned_User_s_Email != ''
+        ''',
+        'aws_admins': '''
+            SELECT COUNT(DISTINCT Email) 
+            FROM app_portfolio 
+            WHERE UPPER(App) LIKE '%AWS%' AND UPPER(Role_s) LIKE '%ADMINISTRATOR%' 
+            AND Account_Status = 'Activated'
+        ''',
+        'notion_users': '''
+            SELECT COUNT(DISTINCT Email) 
+            FROM provisions 
+            WHERE `Notion_-_Josys_inc` = 'Activated' OR `Notion_-_Josys_public` = 'Activated'
+        ''',
+        'lenovo_aws': '''
+            SELECT COUNT(DISTINCT d.Assigned_User_s_Email) 
+            FROM devices d
+            JOIN app_portfolio ap ON d.Assigned_User_s_Email = ap.Email
+            WHERE UPPER(d.Manufacturer) = 'LENOVO' AND UPPER(ap.App) LIKE '%AWS%' 
+            AND UPPER(ap.Role_s) LIKE '%ADMINISTRATOR%' AND ap.Account_Status = 'Activated'
+        ''',
+    }
+    
+    def _analyze_query_breakdown(self, terms: frozenset) -> dict:
         """Analyze breakdown of complex query components."""
         breakdown = {}
         
+        # Hardware, AWS admin access, Notion licenses, and their cross-reference
+        keys = []
+        if 'lenovo' in terms:
+            keys.append('lenovo_users')
+        if 'aws' in terms and 'admin' in terms:
+            keys.append('aws_admins')
+        if 'notion' in terms:
+            keys.append('notion_users')
+        if 'lenovo_users' in keys and 'aws_admins' in keys:
+            keys.append('lenovo_aws')
+        
+        if not keys:
+            return breakdown
+        
+        def count_components():
+            columns = ", ".join(f"({self.BREAKDOWN_COUNT_SQL[key]}) AS {key}" for key in keys)
+            row = self._get_read_conn().execute(f"SELECT {columns}").fetchone()
+            return dict(zip(row.keys(), row))
+        
         try:
-            # Analyze hardware components
-            if 'lenovo' in question_lower:
-                breakdown['lenovo_users'] = self.conn.execute('''
-                    SELECT COUNT(DISTINCT Assigned_User_s_Email) 
-                    FROM devices 
-                    WHERE UPPER(Manufacturer) = 'LENOVO' AND Device_Status = 'In-use'
-                    AND Assigned_User_s_Email IS NOT NULL AND Assigned_User_s_Email != ''
-                ''').fetchone()[0]
-            
-            # Analyze AWS admin access
-            if 'aws' in question_lower and 'admin' in question_lower:
-                breakdown['aws_admins'] = self.conn.execute('''
-                    SELECT COUNT(DISTINCT Email) 
-                    FROM app_portfolio 
-                    WHERE UPPER(App) LIKE '%AWS%' AND UPPER(Role_s) LIKE '%ADMINISTRATOR%' 
-                    AND Account_Status = 'Activated'
-                ''').fetchone()[0]
-            
-            # Analyze Notion licenses
-            if 'notion' in question_lower:
-                breakdown['notion_users'] = self.conn.execute('''
-                    SELECT COUNT(DISTINCT Email) 
-                    FROM provisions 
-                    WHERE `Notion_-_Josys_inc` = 'Activated' OR `Notion_-_Josys_public` = 'Activated'
-                ''').fetchone()[0]
-            
-            # Cross-reference analysis
-            if 'lenovo_users' in breakdown and 'aws_admins' in breakdown:
-                breakdown['lenovo_aws'] = self.conn.execute('''
-                    SELECT COUNT(DISTINCT d.Assigned_User_s_Email) 
-                    FROM devices d
-                    JOIN app_portfolio ap ON d.Assigned_User_s_Email = ap.Email
-                    WHERE UPPER(d.Manufacturer) = 'LENOVO' AND UPPER(ap.App) LIKE '%AWS%' 
-                    AND UPPER(ap.Role_s) LIKE '%ADMINISTRATOR%' AND ap.Account_Status = 'Activated'
-                ''').fetchone()[0]
-            
+            breakdown.update(self._cached_analysis(('breakdown', *keys), count_components))
         except Exception as e:
             breakdown['error'] = str(e)
             
@@ -502,34 +1880,30 @@ Generate ONLY the SQL query (no explanations):"""
                 
         return insights
     
-    def _generate_alternative_suggestions(self, question_lower: str, breakdown_data: dict) -> list:
+    def _generate_alternative_suggestions(self, terms: frozenset, breakdown_data: dict) -> list:
         """Generate alternative query suggestions."""
         suggestions = []
         
-        if 'lenovo' in question_lower and breakdown_data.get('lenovo_aws', 0) == 0:
-            suggestions.append("Try: 'Apple laptop users with AWS admin access'")
+        if 'lenovo' in terms and breakdown_data.get('lenovo_aws', 0) == 0:
+            suggestions.append(SUGGEST_APPLE_AWS_ADMINS)
             
-        if 'aws' in question_lower and 'admin' in question_lower:
-            suggestions.append("Try: 'What devices do AWS admins use?'")
+        if 'aws' in terms and 'admin' in terms:
+            suggestions.append(SUGGEST_AWS_ADMIN_DEVICES)
             
         return suggestions
     
-    def _analyze_device_results(self, results: list) -> list:
-        """Analyze device-related results."""
+    def _analyze_device_results(self, results: list, truncated: bool = False) -> list:
+        """Analyze device-related results; ``truncated`` means they are only the first rows of the answer."""
         insights = []
         
         if not results:
             return insights
             
         # Analyze manufacturers
-        manufacturers = {}
-        for result in results:
-            mfg = result.get('Manufacturer', 'Unknown')
-            manufacturers[mfg] = manufacturers.get(mfg, 0) + 1
-            
-        if manufacturers:
-            top_mfg = max(manufacturers, key=manufacturers.get)
-            insights.append(f"🖥️ Hardware: {top_mfg} is the primary manufacturer ({manufacturers[top_mfg]} devices)")
+        manufacturers = Counter(result.get('Manufacturer', 'Unknown') for result in results)
+        top_mfg, top_count = manufacturers.most_common(1)[0]
+        shown = f" of the first {len(results)} shown" if truncated else ""
+        insights.append(f"🖥️ Hardware: {top_mfg} is the primary manufacturer ({top_count} devices{shown})")
             
         return insights
     
@@ -542,78 +1916,76 @@ Generate ONLY the SQL query (no explanations):"""
             
         return insights
     
-    def _determine_analysis_type(self, question_lower: str) -> str:
+    def _determine_analysis_type(self, terms: frozenset) -> str:
         """Determine the type of analysis performed."""
-        if 'aws' in question_lower and 'admin' in question_lower:
+        if 'aws' in terms and 'admin' in terms:
             return 'security_analysis'
-        elif 'japan' in question_lower:
+        elif 'japan' in terms:
             return 'geographic_analysis'
-        elif 'laptop' in question_lower or 'device' in question_lower:
+        elif 'laptop' in terms or 'device' in terms:
             return 'hardware_analysis'
-        elif 'license' in question_lower or 'notion' in question_lower:
+        elif 'license' in terms or 'notion' in terms:
             return 'software_analysis'
         else:
             return 'general_query'
     
-    def _generate_summary(self, question: str, count: int, insights: list) -> str:
+    def _generate_summary(self, question: str, count: int, insights: list, truncated: bool = False) -> str:
         """Generate a comprehensive summary."""
         if count == 0:
             return f"Query '{question}' returned no results. Breakdown analysis provided to understand why criteria don't intersect."
         else:
-            return f"Query '{question}' successfully found {count} matching records with detailed insights provided."
+            total = f"at least {count}" if truncated else count
+            return f"Query '{question}' successfully found {total} matching records with detailed insights provided."
     
-    def _generate_key_findings(self, question_lower: str, results: list, breakdown_data: dict) -> list:
-        """Generate key findings from the analysis."""
+    def _generate_key_findings(self, terms: frozenset, results: list, breakdown_data: dict,
+                               truncated: bool = False) -> list:
+        """Generate key findings from the analysis; ``truncated`` means ``results`` are only the first rows."""
         findings = []
         
         try:
             # Security-related findings
-            if 'aws' in question_lower and 'admin' in question_lower:
+            if 'aws' in terms and 'admin' in terms:
                 aws_admin_count = breakdown_data.get('aws_admins', 0)
                 if aws_admin_count > 0:
                     findings.append(f"🔐 {aws_admin_count} users have AWS Administrator access in the system")
                     
                     # Check for concentration in specific roles
                     if results:
-                        roles = {}
-                        for result in results:
-                            role = result.get('Job_Title', 'Unknown')
-                            roles[role] = roles.get(role, 0) + 1
-                        if roles:
-                            top_role = max(roles, key=roles.get)
-                            findings.append(f"👔 Most AWS admins are {top_role}: {roles[top_role]} users")
+                        roles = Counter(result.get('Job_Title', 'Unknown') for result in results)
+                        top_role, top_count = roles.most_common(1)[0]
+                        shown = f" of the first {len(results)} shown" if truncated else ""
+                        findings.append(f"👔 Most AWS admins are {top_role}: {top_count} users{shown}")
             
             # Hardware-related findings
-            if 'lenovo' in question_lower or 'laptop' in question_lower:
+            if 'lenovo' in terms or 'laptop' in terms:
                 lenovo_count = breakdown_data.get('lenovo_users', 0)
                 if lenovo_count > 0:
                     findings.append(f"💻 {lenovo_count} employees are assigned Lenovo devices")
                     
                     # Check for zero intersection with other criteria
-                    if 'aws' in question_lower and breakdown_data.get('lenovo_aws', 0) == 0:
+                    if 'aws' in terms and breakdown_data.get('lenovo_aws', 0) == 0:
                         findings.append("⚠️ No overlap between Lenovo users and AWS administrators")
             
             # Geographic findings
-            if 'japan' in question_lower:
+            if 'japan' in terms:
                 # Analyze Japanese name patterns in results
-                japanese_indicators = 0
-                for result in results:
-                    first_name = result.get('First_Name', '').lower()
-                    email = result.get('Email', '').lower()
-                    if any(name in first_name for name in ['tomoyo', 'mari', 'kohei', 'yuki', 'akira']) or '.jp' in email:
-                        japanese_indicators += 1
+                japanese_indicators = sum(
+                    1 for result in results
+                    if (result.get('First_Name') or '').lower() in _JAPANESE_FIRST_NAMES
+                    or (result.get('Email') or '').lower().endswith('.jp')
+                )
                 
                 if japanese_indicators > 0:
                     findings.append(f"🗾 {japanese_indicators} users identified as likely Japanese employees")
             
             # Application licensing findings
-            if 'notion' in question_lower:
+            if 'notion' in terms:
                 notion_count = breakdown_data.get('notion_users', 0)
                 if notion_count > 0:
                     findings.append(f"📝 {notion_count} employees have active Notion licenses")
             
             # Complex query findings
-            if len(results) == 0 and self._is_complex_multi_criteria_query(question_lower):
+            if len(results) == 0 and self._is_complex_multi_criteria_query(terms):
                 findings.append("🔍 Complex criteria analysis shows no users match all requirements simultaneously")
                 findings.append("💡 Consider relaxing one or more criteria to find related users")
                 
@@ -622,32 +1994,33 @@ Generate ONLY the SQL query (no explanations):"""
             
         return findings
     
-    def _generate_cross_references(self, question_lower: str, breakdown_data: dict) -> list:
+    def _generate_cross_references(self, terms: frozenset, breakdown_data: dict) -> list:
         """Generate detailed cross-reference analysis with user listings and status indicators."""
         cross_refs = []
         
         try:
             # Lenovo + AWS Admin cross-reference
-            if 'lenovo' in question_lower and 'aws' in question_lower and 'admin' in question_lower:
-                cross_ref = self._analyze_lenovo_aws_crossref()
+            if 'lenovo' in terms and 'aws' in terms and 'admin' in terms:
+                cross_ref = self._cached_analysis('lenovo_aws_crossref', self._analyze_lenovo_aws_crossref)
                 if cross_ref:
                     cross_refs.append(cross_ref)
             
             # AWS Admin + Notion cross-reference
-            if 'aws' in question_lower and 'admin' in question_lower and 'notion' in question_lower:
-                cross_ref = self._analyze_aws_notion_crossref()
+            if 'aws' in terms and 'admin' in terms and 'notion' in terms:
+                cross_ref = self._cached_analysis('aws_notion_crossref', self._analyze_aws_notion_crossref)
                 if cross_ref:
                     cross_refs.append(cross_ref)
             
             # Apple/MacBook + AWS Admin cross-reference
-            if any(term in question_lower for term in ['apple', 'macbook']) and 'aws' in question_lower and 'admin' in question_lower:
-                cross_ref = self._analyze_apple_aws_crossref()
+            if terms & _APPLE_TERMS and 'aws' in terms and 'admin' in terms:
+                cross_ref = self._cached_analysis('apple_aws_crossref', self._analyze_apple_aws_crossref)
                 if cross_ref:
                     cross_refs.append(cross_ref)
             
             # Geographic + AWS cross-reference
-            if any(geo in question_lower for geo in ['japan', 'india']) and 'aws' in question_lower:
-                cross_ref = self._analyze_geographic_aws_crossref(question_lower)
+            if terms & _AWS_REGION_TERMS and 'aws' in terms:
+                cross_ref = self._cached_analysis(('geographic_aws_crossref', 'japan' in terms),
+                                                  lambda: self._analyze_geographic_aws_crossref(terms))
                 if cross_ref:
                     cross_refs.append(cross_ref)
                     
@@ -662,18 +2035,43 @@ Generate ONLY the SQL query (no explanations):"""
             
         return cross_refs
     
+    @staticmethod
+    def _intersection_result(title: str, rows: Iterable[sqlite3.Row], none_message: str,
+                             extra_columns: Optional[Dict[str, str]] = None, total_base: Optional[int] = None,
+                             details: Optional[Dict[str, str]] = None,
+                             none_details: Optional[Dict[str, str]] = None) -> dict:
+        """Build a cross-reference result listing the AWS admin users from an intersection query's cursor."""
+        extra_columns = extra_columns or {}
+        users = [{
+            'name': f"{row['First_Name']} {row['Last_Name']}".strip(),
+            'email': row['Email'],
+            'aws_identifier': row['Identifier'],
+            'aws_role': row['Role_s'],
+            **{key: row[column] for key, column in extra_columns.items()}
+        } for row in rows]
+        
+        result = {'type': 'intersection', 'title': title, 'status': 'found' if users else 'none', 'count': len(users)}
+        if total_base is not None:
+            result['total_base'] = total_base
+        result['message'] = f"{len(users)} users found" if users else none_message
+        result.update(details or {})
+        if not users:
+            result.update(none_details or {})
+        result['users'] = users
+        return result
+    
     def _analyze_lenovo_aws_crossref(self) -> dict:
         """Analyze Lenovo + AWS Admin cross-reference with detailed user data."""
         try:
             # Get total counts
-            lenovo_count = self.conn.execute('''
+            lenovo_count = self._get_read_conn().execute('''
                 SELECT COUNT(DISTINCT Assigned_User_s_Email) FROM devices 
                 WHERE UPPER(Manufacturer) = 'LENOVO' AND Device_Status = 'In-use'
                 AND Assigned_User_s_Email IS NOT NULL AND Assigned_User_s_Email != ''
             ''').fetchone()[0]
             
             # Get intersection users
-            lenovo_aws_users = self.conn.execute('''
+            lenovo_aws_users = self._get_read_conn().execute('''
                 SELECT DISTINCT 
                     p.First_Name, p.Last_Name, p.Email, 
                     ap.Identifier, ap.Role_s, d.Model_Name
@@ -686,41 +2084,13 @@ Generate ONLY the SQL query (no explanations):"""
                 AND UPPER(ap.Role_s) LIKE '%ADMINISTRATOR%' 
                 AND ap.Account_Status = 'Activated'
                 ORDER BY p.First_Name, p.Last_Name
-            ''').fetchall()
-            
-            intersection_count = len(lenovo_aws_users)
+            ''')
             
-            if intersection_count == 0:
-                return {
-                    'type': 'intersection',
-                    'title': 'Lenovo + AWS Admin',
-                    'status': 'none',
-                    'count': 0,
-                    'total_base': lenovo_count,
-                    'message': f"None of the {lenovo_count} Lenovo laptop users have AWS Administrator access",
-                    'blocker': "This is the primary blocker for the query",
-                    'users': []
-                }
-            else:
-                users = []
-                for user in lenovo_aws_users:
-                    users.append({
-                        'name': f"{user[0]} {user[1]}".strip(),
-                        'email': user[2],
-                        'aws_identifier': user[3],
-                        'aws_role': user[4],
-                        'device_model': user[5]
-                    })
-                
-                return {
-                    'type': 'intersection',
-                    'title': 'Lenovo + AWS Admin',
-                    'status': 'found',
-                    'count': intersection_count,
-                    'total_base': lenovo_count,
-                    'message': f"{intersection_count} users found",
-                    'users': users
-                }
+            return self._intersection_result(
+                'Lenovo + AWS Admin', lenovo_aws_users,
+                f"None of the {lenovo_count} Lenovo laptop users have AWS Administrator access",
+                extra_columns={'device_model': 'Model_Name'}, total_base=lenovo_count,
+                none_details={'blocker': "This is the primary blocker for the query"})
                 
         except Exception as e:
             return {
@@ -735,7 +2105,7 @@ Generate ONLY the SQL query (no explanations):"""
         """Analyze AWS Admin + Notion cross-reference with detailed user data."""
         try:
             # Get AWS admins with Notion access
-            aws_notion_users = self.conn.execute('''
+            aws_notion_users = self._get_read_conn().execute('''
                 SELECT DISTINCT 
                     p.First_Name, p.Last_Name, p.Email, 
                     ap.Identifier, ap.Role_s,
@@ -752,38 +2122,12 @@ Generate ONLY the SQL query (no explanations):"""
                 AND (p.`Notion_-_Josys_inc` = 'Activated' OR p.`Notion_-_Josys_public` = 'Activated')
                 ORDER BY p.First_Name, p.Last_Name
                 LIMIT 10
-            ''').fetchall()
+            ''')
             
-            intersection_count = len(aws_notion_users)
-            
-            if intersection_count == 0:
-                return {
-                    'type': 'intersection',
-                    'title': 'AWS Admin + Notion',
-                    'status': 'none',
-                    'count': 0,
-                    'message': "No AWS Administrators have active Notion licenses",
-                    'users': []
-                }
-            else:
-                users = []
-                for user in aws_notion_users:
-                    users.append({
-                        'name': f"{user[0]} {user[1]}".strip(),
-                        'email': user[2],
-                        'aws_identifier': user[3],
-                        'aws_role': user[4],
-                        'notion_type': user[5]
-                    })
-                
-                return {
-                    'type': 'intersection',
-                    'title': 'AWS Admin + Notion',
-                    'status': 'found',
-                    'count': intersection_count,
-                    'message': f"{intersection_count} users found",
-                    'users': users
-                }
+            return self._intersection_result(
+                'AWS Admin + Notion', aws_notion_users,
+                "No AWS Administrators have active Notion licenses",
+                extra_columns={'notion_type': 'notion_type'})
                 
         except Exception as e:
             return {
@@ -798,7 +2142,7 @@ Generate ONLY the SQL query (no explanations):"""
         """Analyze Apple/MacBook + AWS Admin cross-reference."""
         try:
             # Get Apple users with AWS admin
-            apple_aws_users = self.conn.execute('''
+            apple_aws_users = self._get_read_conn().execute('''
                 SELECT DISTINCT 
                     p.First_Name, p.Last_Name, p.Email, 
                     ap.Identifier, ap.Role_s, d.Model_Name
@@ -812,56 +2156,33 @@ Generate ONLY the SQL query (no explanations):"""
                 AND ap.Account_Status = 'Activated'
                 ORDER BY p.First_Name, p.Last_Name
                 LIMIT 10
-            ''').fetchall()
+            ''')
             
-            intersection_count = len(apple_aws_users)
+            result = self._intersection_result('Apple + AWS Admin', apple_aws_users, '',
+                                               extra_columns={'device_model': 'Model_Name'})
+            if result['count']:
+                return result
             
-            if intersection_count == 0:
-                apple_count = self.conn.execute('''
-                    SELECT COUNT(DISTINCT Assigned_User_s_Email) FROM devices 
-                    WHERE UPPER(Manufacturer) = 'APPLE' AND Device_Status = 'In-use'
-                ''').fetchone()[0]
-                
-                return {
-                    'type': 'intersection',
-                    'title': 'Apple + AWS Admin',
-                    'status': 'none',
-                    'count': 0,
-                    'total_base': apple_count,
-                    'message': f"None of the {apple_count} Apple laptop users have AWS Administrator access",
-                    'users': []
-                }
-            else:
-                users = []
-                for user in apple_aws_users:
-                    users.append({
-                        'name': f"{user[0]} {user[1]}".strip(),
-                        'email': user[2],
-                        'aws_identifier': user[3],
-                        'aws_role': user[4],
-                        'device_model': user[5]
-                    })
-                
-                return {
-                    'type': 'intersection',
-                    'title': 'Apple + AWS Admin',
-                    'status': 'found',
-                    'count': intersection_count,
-                    'message': f"{intersection_count} users found",
-                    'users': users
-                }
+            apple_count = self._get_read_conn().execute('''
+                SELECT COUNT(DISTINCT Assigned_User_s_Email) FROM devices 
+                WHERE UPPER(Manufacturer) = 'APPLE' AND Device_Status = 'In-use'
+            ''').fetchone()[0]
+            return self._intersection_result(
+                'Apple + AWS Admin', [],
+                f"None of the {apple_count} Apple laptop users have AWS Administrator access",
+                total_base=apple_count)
                 
         except Exception as e:
             return None
     
-    def _analyze_geographic_aws_crossref(self, question_lower: str) -> dict:
+    def _analyze_geographic_aws_crossref(self, terms: frozenset) -> dict:
         """Analyze geographic + AWS cross-reference."""
         try:
-            location = 'Japan' if 'japan' in question_lower else 'India' if 'india' in question_lower else 'Unknown'
+            location = 'Japan' if 'japan' in terms else 'India' if 'india' in terms else 'Unknown'
             
             if location == 'Japan':
                 # Get AWS admins in Japan (using name patterns and .jp emails)
-                japan_aws_users = self.conn.execute('''
+                japan_aws_users = self._get_read_conn().execute('''
                     SELECT DISTINCT 
                         p.First_Name, p.Last_Name, p.Email, 
                         ap.Identifier, ap.Role_s
@@ -870,48 +2191,21 @@ Generate ONLY the SQL query (no explanations):"""
                     WHERE UPPER(ap.App) LIKE '%AWS%'
                     AND UPPER(ap.Role_s) LIKE '%ADMINISTRATOR%'
                     AND ap.Account_Status = 'Activated'
-                    AND (LOWER(p.First_Name) IN ('tomoyo', 'mari', 'kohei', 'yuki', 'akira') 
-                         OR p.Email LIKE '%.jp')
+                    AND (LOWER(p.First_Name) IN ('tomoyo', 'mari', 'kohei', 'yuki', 'akira')
+                         OR LOWER(substr(p.Email, -3)) = '.jp')
                     ORDER BY p.First_Name, p.Last_Name
                     LIMIT 10
-                ''').fetchall()
-                
-                intersection_count = len(japan_aws_users)
+                ''')
                 
-                if intersection_count == 0:
-                    return {
-                        'type': 'intersection',
-                        'title': 'Japan + AWS Admin',
-                        'status': 'none',
-                        'count': 0,
-                        'message': "No AWS Administrators identified as Japan-based employees",
-                        'note': "Based on name patterns and .jp email domains",
-                        'users': []
-                    }
-                else:
-                    users = []
-                    for user in japan_aws_users:
-                        users.append({
-                            'name': f"{user[0]} {user[1]}".strip(),
-                            'email': user[2],
-                            'aws_identifier': user[3],
-                            'aws_role': user[4]
-                        })
-                    
-                    return {
-                        'type': 'intersection',
-                        'title': 'Japan + AWS Admin',
-                        'status': 'found',
-                        'count': intersection_count,
-                        'message': f"{intersection_count} users found",
-                        'note': "Based on name patterns and .jp email domains",
-                        'users': users
-                    }
+                return self._intersection_result(
+                    'Japan + AWS Admin', japan_aws_users,
+                    "No AWS Administrators identified as Japan-based employees",
+                    details={'note': "Based on name patterns and .jp email domains"})
             
         except Exception as e:
             return None
     
-    def _generate_detailed_breakdown_analysis(self, question_lower: str, results: list) -> dict:
+    def _generate_detailed_breakdown_analysis(self, terms: frozenset) -> dict:
         """Generate comprehensive breakdown analysis for users, provisions, devices, and combinations."""
         
         breakdown = {
@@ -921,40 +2215,43 @@ Generate ONLY the SQL query (no explanations):"""
             'summary': ''
         }
         
+        if not terms & _BREAKDOWN_TERMS:
+            return breakdown
+        
         try:
             # Analyze different query components
             components_found = []
             
             # 1. Device/Hardware Analysis
-            if any(term in question_lower for term in ['laptop', 'device', 'computer', 'phone', 'lenovo', 'apple', 'macbook']):
-                device_stats = self._analyze_device_components(question_lower)
+            if terms & _DEVICE_TERMS:
+                device_stats = self._analyze_device_components(terms)
                 components_found.extend(device_stats)
             
             # 2. User/Employee Analysis
-            if any(term in question_lower for term in ['user', 'employee', 'person', 'people', 'staff']):
-                user_stats = self._analyze_user_components(question_lower)
+            if terms & _USER_TERMS:
+                user_stats = self._analyze_user_components(terms)
                 components_found.extend(user_stats)
             
             # 3. Application/Access Analysis
-            if any(term in question_lower for term in ['aws', 'admin', 'notion', 'github', 'slack', 'app', 'access', 'license']):
-                app_stats = self._analyze_application_components(question_lower)
+            if terms & _APPLICATION_TERMS:
+                app_stats = self._analyze_application_components(terms)
                 components_found.extend(app_stats)
             
             # 4. Geographic Analysis
-            if any(term in question_lower for term in ['japan', 'india', 'bangalore', 'tokyo', 'location']):
-                geo_stats = self._analyze_geographic_components(question_lower)
+            if terms & _GEOGRAPHIC_TERMS:
+                geo_stats = self._analyze_geographic_components(terms)
                 components_found.extend(geo_stats)
             
             # 5. Role/Department Analysis
-            if any(term in question_lower for term in ['role', 'department', 'title', 'position']):
-                role_stats = self._analyze_role_components(question_lower)
+            if terms & _ROLE_TERMS:
+                role_stats = self._analyze_role_components(terms)
                 components_found.extend(role_stats)
             
             breakdown['components'] = components_found
             
             # Generate intersection analysis
             if len(components_found) > 1:
-                intersections = self._analyze_component_intersections(question_lower, components_found)
+                intersections = self._analyze_component_intersections(terms, components_found)
                 breakdown['intersections'] = intersections
             
             # Generate summary
@@ -967,48 +2264,88 @@ Generate ONLY the SQL query (no explanations):"""
             
         return breakdown
     
-    def _analyze_device_components(self, question_lower: str) -> list:
+    # Counts behind the component analyses, computed with one conditional
+    # aggregate per table instead of one COUNT query per component
+    COMPONENT_COUNT_SQL = {
+        'devices': '''
+        SELECT
+            COUNT(CASE WHEN Device_Status = 'In-use' THEN 1 END) AS total_devices,
+            COUNT(DISTINCT CASE WHEN UPPER(Manufacturer) = 'LENOVO' AND Device_Status = 'In-use'
+                                 AND Assigned_User_s_Email != '' THEN Assigned_User_s_Email END) AS lenovo_users,
+            COUNT(DISTINCT CASE WHEN UPPER(Manufacturer) = 'APPLE' AND Device_Status = 'In-use'
+                                 AND Assigned_User_s_Email != '' THEN Assigned_User_s_Email END) AS apple_users,
+            COUNT(DISTINCT CASE WHEN Device_Status = 'In-use'
+                                 AND Assigned_User_s_Email != '' THEN Assigned_User_s_Email END) AS active_employees,
+            COUNT(DISTINCT CASE WHEN (UPPER(Region) LIKE '%JAPAN%' OR UPPER(City) LIKE '%TOKYO%')
+                                 AND Device_Status = 'In-use' THEN Assigned_User_s_Email END) AS japan_devices,
+            COUNT(DISTINCT CASE WHEN (UPPER(Region) LIKE '%INDIA%' OR UPPER(City) LIKE '%BANGALORE%')
+                                 AND Device_Status = 'In-use' THEN Assigned_User_s_Email END) AS india_devices
+        FROM devices
+        ''',
+        'provisions': '''
+        SELECT
+            COUNT(DISTINCT CASE WHEN Email != '' THEN Email END) AS total_users,
+            COUNT(DISTINCT CASE WHEN `Notion_-_Josys_inc` = 'Activated' OR `Notion_-_Josys_public` = 'Activated'
+                                 THEN Email END) AS notion_users,
+            COUNT(DISTINCT CASE WHEN LOWER(First_Name) IN ('tomoyo', 'mari', 'kohei', 'yuki', 'akira')
+                                 OR LOWER(substr(Email, -3)) = '.jp' THEN Email END) AS japanese_names
+        FROM provisions
+        ''',
+        'app_portfolio': '''
+        SELECT
+            COUNT(DISTINCT CASE WHEN UPPER(App) LIKE '%AWS%' AND UPPER(Role_s) LIKE '%ADMINISTRATOR%'
+                                 AND Account_Status = 'Activated' THEN Email END) AS aws_admins,
+            COUNT(DISTINCT CASE WHEN UPPER(App) LIKE '%GITHUB%' AND Account_Status = 'Activated'
+                                 THEN Email END) AS github_users
+        FROM app_portfolio
+        ''',
+    }
+    COMPONENT_COUNT_TABLES = {
+        name: table for table, sql in COMPONENT_COUNT_SQL.items() for name in re.findall(r'\bAS (\w+)', sql)
+    }
+    
+    def _component_count(self, name: str) -> int:
+        """Return one component count, running (and memoizing) only the aggregate for its table."""
+        table = self.COMPONENT_COUNT_TABLES[name]
+        counts = self._cached_analysis(('component_counts', table), lambda: dict(
+            self._get_read_conn().execute(self.COMPONENT_COUNT_SQL[table]).fetchone()))
+        return counts[name]
+    
+    def _analyze_device_components(self, terms: frozenset) -> list:
         """Analyze device-related components."""
         components = []
         
         try:
             # Total active devices
-            total_devices = self.conn.execute('''
-                SELECT COUNT(*) FROM devices WHERE Device_Status = 'In-use'
-            ''').fetchone()[0]
+            total_devices = self._component_count('total_devices')
             
             if total_devices > 0:
                 components.append({
                     'name': 'Active Devices',
+                    'kind': 'devices',
                     'count': total_devices,
                     'status': 'success',
                     'icon': '💻'
                 })
             
             # Specific manufacturer analysis
-            if 'lenovo' in question_lower:
-                lenovo_count = self.conn.execute('''
-                    SELECT COUNT(DISTINCT Assigned_User_s_Email) FROM devices 
-                    WHERE UPPER(Manufacturer) = 'LENOVO' AND Device_Status = 'In-use'
-                    AND Assigned_User_s_Email IS NOT NULL AND Assigned_User_s_Email != ''
-                ''').fetchone()[0]
+            if 'lenovo' in terms:
+                lenovo_count = self._component_count('lenovo_users')
                 
                 components.append({
                     'name': 'Lenovo laptop users',
+                    'kind': 'lenovo',
                     'count': lenovo_count,
                     'status': 'success' if lenovo_count > 0 else 'warning',
                     'icon': '💻'
                 })
             
-            if any(term in question_lower for term in ['apple', 'macbook']):
-                apple_count = self.conn.execute('''
-                    SELECT COUNT(DISTINCT Assigned_User_s_Email) FROM devices 
-                    WHERE UPPER(Manufacturer) = 'APPLE' AND Device_Status = 'In-use'
-                    AND Assigned_User_s_Email IS NOT NULL AND Assigned_User_s_Email != ''
-                ''').fetchone()[0]
+            if terms & _APPLE_TERMS:
+                apple_count = self._component_count('apple_users')
                 
                 components.append({
                     'name': 'Apple laptop users',
+                    'kind': 'apple',
                     'count': apple_count,
                     'status': 'success' if apple_count > 0 else 'warning',
                     'icon': '🍎'
@@ -1019,33 +2356,30 @@ Generate ONLY the SQL query (no explanations):"""
             
         return components
     
-    def _analyze_user_components(self, question_lower: str) -> list:
+    def _analyze_user_components(self, terms: frozenset) -> list:
         """Analyze user-related components."""
         components = []
         
         try:
             # Total active users
-            total_users = self.conn.execute('''
-                SELECT COUNT(DISTINCT Email) FROM provisions WHERE Email IS NOT NULL AND Email != ''
-            ''').fetchone()[0]
+            total_users = self._component_count('total_users')
             
             if total_users > 0:
                 components.append({
                     'name': 'Total Users',
+                    'kind': 'users',
                     'count': total_users,
                     'status': 'success',
                     'icon': '👥'
                 })
             
             # Active employees (those with devices)
-            active_employees = self.conn.execute('''
-                SELECT COUNT(DISTINCT Assigned_User_s_Email) FROM devices 
-                WHERE Device_Status = 'In-use' AND Assigned_User_s_Email IS NOT NULL AND Assigned_User_s_Email != ''
-            ''').fetchone()[0]
+            active_employees = self._component_count('active_employees')
             
             if active_employees > 0:
                 components.append({
                     'name': 'Active Employees',
+                    'kind': 'employees',
                     'count': active_employees,
                     'status': 'success',
                     'icon': '👤'
@@ -1056,49 +2390,42 @@ Generate ONLY the SQL query (no explanations):"""
             
         return components
     
-    def _analyze_application_components(self, question_lower: str) -> list:
+    def _analyze_application_components(self, terms: frozenset) -> list:
         """Analyze application/access-related components."""
         components = []
         
         try:
             # AWS Admin analysis
-            if 'aws' in question_lower and 'admin' in question_lower:
-                aws_admins = self.conn.execute('''
-                    SELECT COUNT(DISTINCT Email) FROM app_portfolio 
-                    WHERE UPPER(App) LIKE '%AWS%' AND UPPER(Role_s) LIKE '%ADMINISTRATOR%' 
-                    AND Account_Status = 'Activated'
-                ''').fetchone()[0]
+            if 'aws' in terms and 'admin' in terms:
+                aws_admins = self._component_count('aws_admins')
                 
                 components.append({
                     'name': 'AWS Admin users',
+                    'kind': 'aws_admin',
                     'count': aws_admins,
                     'status': 'success' if aws_admins > 0 else 'warning',
                     'icon': '☁️'
                 })
             
             # Notion license analysis
-            if 'notion' in question_lower:
-                notion_users = self.conn.execute('''
-                    SELECT COUNT(DISTINCT Email) FROM provisions 
-                    WHERE `Notion_-_Josys_inc` = 'Activated' OR `Notion_-_Josys_public` = 'Activated'
-                ''').fetchone()[0]
+            if 'notion' in terms:
+                notion_users = self._component_count('notion_users')
                 
                 components.append({
                     'name': 'Notion license users',
+                    'kind': 'notion',
                     'count': notion_users,
                     'status': 'success' if notion_users > 0 else 'warning',
                     'icon': '📝'
                 })
             
             # GitHub access analysis
-            if 'github' in question_lower:
-                github_users = self.conn.execute('''
-                    SELECT COUNT(DISTINCT Email) FROM app_portfolio 
-                    WHERE UPPER(App) LIKE '%GITHUB%' AND Account_Status = 'Activated'
-                ''').fetchone()[0]
+            if 'github' in terms:
+                github_users = self._component_count('github_users')
                 
                 components.append({
                     'name': 'GitHub users',
+                    'kind': 'github',
                     'count': github_users,
                     'status': 'success' if github_users > 0 else 'warning',
                     'icon': '🐙'
@@ -1109,45 +2436,35 @@ Generate ONLY the SQL query (no explanations):"""
             
         return components
     
-    def _analyze_geographic_components(self, question_lower: str) -> list:
+    def _analyze_geographic_components(self, terms: frozenset) -> list:
         """Analyze geographic-related components."""
         components = []
         
         try:
             # Japan analysis
-            if 'japan' in question_lower or 'tokyo' in question_lower:
-                japan_devices = self.conn.execute('''
-                    SELECT COUNT(DISTINCT Assigned_User_s_Email) FROM devices 
-                    WHERE (UPPER(Region) LIKE '%JAPAN%' OR UPPER(City) LIKE '%TOKYO%')
-                    AND Device_Status = 'In-use'
-                ''').fetchone()[0]
+            if 'japan' in terms or 'tokyo' in terms:
+                japan_devices = self._component_count('japan_devices')
                 
                 # Also check for Japanese name patterns
-                japanese_names = self.conn.execute('''
-                    SELECT COUNT(DISTINCT Email) FROM provisions 
-                    WHERE LOWER(First_Name) IN ('tomoyo', 'mari', 'kohei', 'yuki', 'akira')
-                    OR Email LIKE '%.jp'
-                ''').fetchone()[0]
+                japanese_names = self._component_count('japanese_names')
                 
                 total_japan = max(japan_devices, japanese_names)
                 
                 components.append({
                     'name': 'Japan-based users',
+                    'kind': 'japan',
                     'count': total_japan,
                     'status': 'success' if total_japan > 0 else 'warning',
                     'icon': '🗾'
                 })
             
             # India analysis
-            if 'india' in question_lower or 'bangalore' in question_lower:
-                india_devices = self.conn.execute('''
-                    SELECT COUNT(DISTINCT Assigned_User_s_Email) FROM devices 
-                    WHERE (UPPER(Region) LIKE '%INDIA%' OR UPPER(City) LIKE '%BANGALORE%')
-                    AND Device_Status = 'In-use'
-                ''').fetchone()[0]
+            if 'india' in terms or 'bangalore' in terms:
+                india_devices = self._component_count('india_devices')
                 
                 components.append({
                     'name': 'India-based users',
+                    'kind': 'india',
                     'count': india_devices,
                     'status': 'success' if india_devices > 0 else 'warning',
                     'icon': '🇮🇳'
@@ -1158,13 +2475,13 @@ Generate ONLY the SQL query (no explanations):"""
             
         return components
     
-    def _analyze_role_components(self, question_lower: str) -> list:
+    def _analyze_role_components(self, terms: frozenset) -> list:
         """Analyze role/department-related components."""
         components = []
         
         try:
             # Get top departments
-            departments = self.conn.execute('''
+            departments = self._get_read_conn().execute('''
                 SELECT Department_s, COUNT(*) as count FROM app_portfolio 
                 WHERE Department_s IS NOT NULL AND Department_s != '' 
                 GROUP BY Department_s ORDER BY count DESC LIMIT 3
@@ -1173,6 +2490,7 @@ Generate ONLY the SQL query (no explanations):"""
             for dept, count in departments:
                 components.append({
                     'name': f'{dept} department',
+                    'kind': 'department',
                     'count': count,
                     'status': 'success',
                     'icon': '🏢'
@@ -1183,19 +2501,21 @@ Generate ONLY the SQL query (no explanations):"""
             
         return components
     
-    def _analyze_component_intersections(self, question_lower: str, components: list) -> list:
+    def _analyze_component_intersections(self, terms: frozenset, components: list) -> list:
         """Analyze intersections between different components."""
         intersections = []
         
         try:
+            kinds = {comp.get('kind') for comp in components}
+            
             # Lenovo + AWS Admin intersection
-            if any('lenovo' in comp['name'].lower() for comp in components) and any('aws' in comp['name'].lower() for comp in components):
-                lenovo_aws = self.conn.execute('''
+            if {'lenovo', 'aws_admin'} <= kinds:
+                lenovo_aws = self._cached_analysis('lenovo_aws_intersection', lambda: self._get_read_conn().execute('''
                     SELECT COUNT(DISTINCT d.Assigned_User_s_Email) FROM devices d
                     JOIN app_portfolio ap ON d.Assigned_User_s_Email = ap.Email
                     WHERE UPPER(d.Manufacturer) = 'LENOVO' AND UPPER(ap.App) LIKE '%AWS%' 
                     AND UPPER(ap.Role_s) LIKE '%ADMINISTRATOR%' AND ap.Account_Status = 'Activated'
-                ''').fetchone()[0]
+                ''').fetchone()[0])
                 
                 intersections.append({
                     'name': 'Lenovo users with AWS Admin',
@@ -1205,13 +2525,13 @@ Generate ONLY the SQL query (no explanations):"""
                 })
             
             # AWS + Notion intersection
-            if any('aws' in comp['name'].lower() for comp in components) and any('notion' in comp['name'].lower() for comp in components):
-                aws_notion = self.conn.execute('''
+            if {'aws_admin', 'notion'} <= kinds:
+                aws_notion = self._cached_analysis('aws_notion_intersection', lambda: self._get_read_conn().execute('''
                     SELECT COUNT(DISTINCT ap.Email) FROM app_portfolio ap
                     JOIN provisions p ON ap.Email = p.Email
                     WHERE UPPER(ap.App) LIKE '%AWS%' AND UPPER(ap.Role_s) LIKE '%ADMINISTRATOR%'
                     AND (p.`Notion_-_Josys_inc` = 'Activated' OR p.`Notion_-_Josys_public` = 'Activated')
-                ''').fetchone()[0]
+                ''').fetchone()[0])
                 
                 intersections.append({
                     'name': 'AWS Admins with Notion',
@@ -1225,20 +2545,8 @@ Generate ONLY the SQL query (no explanations):"""
             
         return intersections
 
-def create_openai_app() -> Flask:
-    """Create Flask app with OpenAI NLP capabilities."""
-    
-    app = Flask(__name__)
-    
-    try:
-        nlp = JosysOpenAINLP()
-    except Exception as e:
-        print(f"❌ Failed to initialize OpenAI NLP: {e}")
-        return None
-    
-    @app.route('/')
-    def index():
-        return '''
+# The page is static, so it is encoded and fingerprinted once at import time
+INDEX_HTML = '''
 <!DOCTYPE html>
 <html>
 <head>
@@ -1352,7 +2660,7 @@ def create_openai_app() -> Flask:
     <div class="container">
         <div class="header">
             <h1>🤖 Josys OpenAI NLP Search</h1>
-            <p>AI-powered natural language search with OpenAI GPT-3.5</p>
+            <p>AI-powered natural language search with OpenAI GPT-4o mini</p>
             <div style="margin-top: 10px;">
                 <span class="badge">🧠 NL2SQL</span>
                 <span class="badge">🔍 Smart Search</span>
@@ -1362,7 +2670,7 @@ def create_openai_app() -> Flask:
         
         <div class="search-section">
             <div class="search-box">
-                <input type="text" id="searchInput" class="search-input" 
+                <input type="text" id="searchInput" class="search-input" maxlength="500"
                        placeholder="Ask anything in natural language... e.g., 'list all devices assigned to Arvind'"
                        onkeypress="if(event.key==='Enter') performSearch()">
                 <button onclick="performSearch()" class="search-btn" id="searchBtn">Ask AI</button>
@@ -1404,6 +2712,9 @@ def create_openai_app() -> Flask:
             performSearch();
         }
         
+        // Questions already answered in this tab are re-fetched with GET so the browser cache can serve them
+        const answeredQuestions = new Set();
+        
         async function performSearch() {
             const question = document.getElementById('searchInput').value.trim();
             if (!question) return;
@@ -1417,14 +2728,21 @@ def create_openai_app() -> Flask:
             resultsContent.innerHTML = `
                 <div class="loading">
                     <div class="spinner"></div>
-                    AI is processing your question using OpenAI GPT-3.5...
+                    AI is processing your question using OpenAI GPT-4o mini...
                 </div>
             `;
             searchBtn.disabled = true;
             searchBtn.textContent = 'Processing...';
             
             try {
-                const response = await fetch('/api/nlp-search', {
+                if (answeredQuestions.has(question)) {
+                    const response = await fetch(`/api/nlp-search?q=${encodeURIComponent(question)}`);
+                    if (!response.ok) throw new Error(`HTTP error! status: ${response.status}`);
+                    displayResults(await response.json());
+                    return;
+                }
+                
+                const response = await fetch('/api/nlp-search/stream', {
                     method: 'POST',
                     headers: { 'Content-Type': 'application/json' },
                     body: JSON.stringify({ question: question, type: 'combined' })
@@ -1432,14 +2750,44 @@ def create_openai_app() -> Flask:
                 
                 if (!response.ok) throw new Error(`HTTP error! status: ${response.status}`);
                 
-                const data = await response.json();
-                displayResults(data);
+                // Rows arrive first ('results'), the full analysis last ('complete' or 'error')
+                const reader = response.body.getReader();
+                const decoder = new TextDecoder();
+                let buffer = '';
+                while (true) {
+                    const { value, done } = await reader.read();
+                    if (done) break;
+                    buffer += decoder.decode(value, { stream: true });
+                    
+                    let boundary;
+                    while ((boundary = buffer.indexOf('\\n\\n')) !== -1) {
+                        const block = buffer.slice(0, boundary);
+                        buffer = buffer.slice(boundary + 2);
+                        const eventMatch = block.match(/^event: (.*)$/m);
+                        const dataMatch = block.match(/^data: (.*)$/m);
+                        if (!dataMatch) continue;
+                        
+                        const data = JSON.parse(dataMatch[1]);
+                        displayResults(data);
+                        if (eventMatch && eventMatch[1] === 'complete' && data.status === 'success') {
+                            answeredQuestions.add(question);
+                        }
+                        if (eventMatch && eventMatch[1] === 'results') {
+                            resultsContent.insertAdjacentHTML('beforeend', `
+                                <div class="loading">
+                                    <div class="spinner"></div>
+                                    Analyzing results...
+                                </div>
+                            `);
+                        }
+                    }
+                }
                 
             } catch (error) {
                 resultsContent.innerHTML = `
                     <div style="text-align: center; padding: 30px; color: #dc3545;">
                         <h3>❌ AI Processing Error</h3>
-                        <p>${error.message}</p>
+                        <p>${escapeHtml(error.message)}</p>
                         <p style="margin-top: 15px;">
                             <small>Check that your OpenAI API key is valid and you have credits available.</small>
                         </p>
@@ -1458,7 +2806,7 @@ def create_openai_app() -> Flask:
                 <div class="stats">
                     <div>
                         <strong>${data.count || 0}</strong> results found using 
-                        <span class="method-badge">${data.method || 'unknown'}</span>
+                        <span class="method-badge">${escapeHtml(data.method || 'unknown')}</span>
                     </div>
                     <div>⚡ ${((data.execution_time || 0) * 1000).toFixed(0)}ms</div>
                 </div>
@@ -1468,7 +2816,7 @@ def create_openai_app() -> Flask:
             if (data.status === 'error' || data.error) {
                 html += `
                     <div style="background: #f8d7da; color: #721c24; padding: 15px; border-radius: 6px; margin-bottom: 15px;">
-                        <strong>Error:</strong> ${data.error || 'Unknown error occurred'}
+                        <strong>Error:</strong> ${escapeHtml(data.error || 'Unknown error occurred')}
                     </div>
                 `;
             }
@@ -1482,7 +2830,7 @@ def create_openai_app() -> Flask:
                 `;
                 
                 data.insights.forEach(insight => {
-                    html += `<div style="margin: 8px 0; line-height: 1.5;">${insight}</div>`;
+                    html += `<div style="margin: 8px 0; line-height: 1.5;">${escapeHtml(insight)}</div>`;
                 });
                 
                 html += `</div></div>`;
@@ -1506,8 +2854,8 @@ def create_openai_app() -> Flask:
                     html += `
                         <div style="margin: 8px 0; padding: 8px 12px; background: white; border-radius: 6px; border-left: 4px solid ${statusColor}; display: flex; align-items: center;">
                             <span style="margin-right: 8px;">${statusIcon}</span>
-                            <span style="margin-right: 8px;">${component.icon || '📋'}</span>
-                            <span><strong>${component.name}:</strong> ${component.count} users</span>
+                            <span style="margin-right: 8px;">${escapeHtml(component.icon || '📋')}</span>
+                            <span><strong>${escapeHtml(component.name)}:</strong> ${escapeHtml(component.count)} users</span>
                         </div>
                     `;
                 });
@@ -1523,8 +2871,8 @@ def create_openai_app() -> Flask:
                         html += `
                             <div style="margin: 8px 0; padding: 8px 12px; background: white; border-radius: 6px; border-left: 4px solid ${statusColor}; display: flex; align-items: center;">
                                 <span style="margin-right: 8px;">${statusIcon}</span>
-                                <span style="margin-right: 8px;">${intersection.icon || '🔗'}</span>
-                                <span><strong>${intersection.name}:</strong> ${intersection.count} users</span>
+                                <span style="margin-right: 8px;">${escapeHtml(intersection.icon || '🔗')}</span>
+                                <span><strong>${escapeHtml(intersection.name)}:</strong> ${escapeHtml(intersection.count)} users</span>
                             </div>
                         `;
                     });
@@ -1534,7 +2882,7 @@ def create_openai_app() -> Flask:
                 if (data.detailed_breakdown.summary) {
                     html += `
                         <div style="margin-top: 15px; padding-top: 15px; border-top: 1px solid #ffcc80; font-style: italic; color: #666;">
-                            ${data.detailed_breakdown.summary}
+                            ${escapeHtml(data.detailed_breakdown.summary)}
                         </div>
                     `;
                 }
@@ -1551,7 +2899,7 @@ def create_openai_app() -> Flask:
                 `;
                 
                 data.key_findings.forEach(finding => {
-                    html += `<div style="margin: 8px 0; line-height: 1.5; padding: 6px 0; border-left: 3px solid #ffb74d; padding-left: 12px;">${finding}</div>`;
+                    html += `<div style="margin: 8px 0; line-height: 1.5; padding: 6px 0; border-left: 3px solid #ffb74d; padding-left: 12px;">${escapeHtml(finding)}</div>`;
                 });
                 
                 html += `</div></div>`;
@@ -1573,23 +2921,23 @@ def create_openai_app() -> Flask:
                         <div style="margin: 15px 0; padding: 15px; background: white; border-radius: 8px; border-left: 4px solid ${statusColor};">
                             <div style="display: flex; align-items: center; margin-bottom: 10px;">
                                 <span style="font-size: 18px; margin-right: 10px;">${statusIcon}</span>
-                                <strong style="color: #7b1fa2; font-size: 16px;">${crossRef.title}: ${crossRef.count} users</strong>
+                                <strong style="color: #7b1fa2; font-size: 16px;">${escapeHtml(crossRef.title)}: ${escapeHtml(crossRef.count)} users</strong>
                             </div>
                     `;
                     
                     // Add message/explanation
                     if (crossRef.message) {
-                        html += `<div style="margin: 8px 0 12px 28px; color: #555; font-style: italic;">${crossRef.message}</div>`;
+                        html += `<div style="margin: 8px 0 12px 28px; color: #555; font-style: italic;">${escapeHtml(crossRef.message)}</div>`;
                     }
                     
                     // Add blocker information for zero results
                     if (crossRef.blocker) {
-                        html += `<div style="margin: 8px 0 12px 28px; color: #d32f2f; font-weight: bold;">${crossRef.blocker}</div>`;
+                        html += `<div style="margin: 8px 0 12px 28px; color: #d32f2f; font-weight: bold;">${escapeHtml(crossRef.blocker)}</div>`;
                     }
                     
                     // Add note if available
                     if (crossRef.note) {
-                        html += `<div style="margin: 8px 0 12px 28px; color: #666; font-size: 14px;">${crossRef.note}</div>`;
+                        html += `<div style="margin: 8px 0 12px 28px; color: #666; font-size: 14px;">${escapeHtml(crossRef.note)}</div>`;
                     }
                     
                     // Display user details if found
@@ -1599,25 +2947,25 @@ def create_openai_app() -> Flask:
                         crossRef.users.forEach(user => {
                             html += `
                                 <div style="margin: 6px 0; padding: 8px 12px; background: #f8f9fa; border-radius: 4px; border-left: 3px solid #28a745;">
-                                    <strong>${user.name}</strong> (${user.email})
+                                    <strong>${escapeHtml(user.name)}</strong> (${escapeHtml(user.email)})
                             `;
                             
                             // Add AWS details if available
                             if (user.aws_identifier && user.aws_role) {
-                                html += ` - AWS: ${user.aws_identifier}`;
+                                html += ` - AWS: ${escapeHtml(user.aws_identifier)}`;
                                 if (user.aws_role && user.aws_role !== user.aws_identifier) {
-                                    html += ` [${user.aws_role}]`;
+                                    html += ` [${escapeHtml(user.aws_role)}]`;
                                 }
                             }
                             
                             // Add device details if available
                             if (user.device_model) {
-                                html += ` - Device: ${user.device_model}`;
+                                html += ` - Device: ${escapeHtml(user.device_model)}`;
                             }
                             
                             // Add Notion details if available
                             if (user.notion_type) {
-                                html += ` - Notion: ${user.notion_type}`;
+                                html += ` - Notion: ${escapeHtml(user.notion_type)}`;
                             }
                             
                             html += `</div>`;
@@ -1640,77 +2988,17 @@ def create_openai_app() -> Flask:
                     <div style="text-align: center; padding: 30px; color: #666;">
                         <h3>🔍 No Results Found</h3>
                         <p>Try rephrasing your question or using different terms.</p>
-                        ${data.fallback_reason ? `<p><small>Reason: ${data.fallback_reason}</small></p>` : ''}
+                        ${data.fallback_reason ? `<p><small>Reason: ${escapeHtml(data.fallback_reason)}</small></p>` : ''}
                     </div>
                 `;
             } else {
                 // Add results header
                 html += `
                     <div style="background: #f8f9fa; border: 1px solid #dee2e6; border-radius: 8px; padding: 15px; margin: 20px 0;">
-                        <h3 style="color: #495057; margin: 0 0 15px 0;">📋 Results (${results.length})</h3>
-                        <div style="display: flex; flex-direction: column; gap: 12px;">
+                        <h3 style="color: #495057; margin: 0 0 15px 0;">📋 Results (${data.truncated ? `first ${results.length}` : results.length})</h3>
+                        <div id="resultCards" style="max-height: 600px; overflow-y: auto;"></div>
+                    </div>
                 `;
-                
-                results.forEach((result, index) => {
-                    const data = result.data || result;
-                    const isDevice = result.type === 'device' || data.Asset_Number;
-                    const isAppAccess = data.App || data.Identifier;
-                    
-                    // Determine result type and icon
-                    let icon = '👤';
-                    let type = 'User';
-                    if (isDevice) {
-                        icon = '💻';
-                        type = 'Device';
-                    } else if (isAppAccess) {
-                        icon = '🔑';
-                        type = 'App Access';
-                    }
-                    
-                    html += `
-                        <div style="background: white; border: 1px solid #e9ecef; border-radius: 6px; padding: 12px;">
-                            <div style="display: flex; align-items: center; margin-bottom: 8px;">
-                                <span style="font-size: 16px; margin-right: 8px;">${icon}</span>
-                                <strong style="color: #212529;">${type} #${index + 1}</strong>
-                            </div>
-                            <div style="color: #6c757d; line-height: 1.6;">
-                    `;
-                    
-                    if (isDevice) {
-                        html += `
-                            <div><strong>Asset:</strong> ${data.Asset_Number || 'N/A'}</div>
-                            <div><strong>Device:</strong> ${data.Manufacturer || 'N/A'} ${data.Model_Name || 'N/A'} (${data.Device_Type || 'N/A'})</div>
-                            <div><strong>Status:</strong> ${data.Device_Status || 'N/A'}</div>
-                            <div><strong>Assigned to:</strong> ${data.Assigned_User_s_Email || 'Unassigned'}</div>
-                            ${data.City || data.Region ? `<div><strong>Location:</strong> ${data.City || 'N/A'}, ${data.Region || 'N/A'}</div>` : ''}
-                        `;
-                    } else if (isAppAccess) {
-                        html += `
-                            <div><strong>Application:</strong> ${data.App || 'N/A'}</div>
-                            <div><strong>User:</strong> ${data.First_Name || ''} ${data.Last_Name || ''} (${data.Email || 'N/A'})</div>
-                            <div><strong>Access ID:</strong> ${data.ID || data.Identifier || 'N/A'}</div>
-                            <div><strong>Role:</strong> ${data.Role_s || data.Role || 'N/A'}</div>
-                            <div><strong>Status:</strong> ${data.Account_Status || data.Status || 'N/A'}</div>
-                            ${data.Department_s ? `<div><strong>Department:</strong> ${data.Department_s}</div>` : ''}
-                        `;
-                    } else {
-                        html += `
-                            <div><strong>Name:</strong> ${data.First_Name || ''} ${data.Last_Name || ''}</div>
-                            <div><strong>Email:</strong> ${data.Email || 'N/A'}</div>
-                            ${data.User_ID ? `<div><strong>User ID:</strong> ${data.User_ID}</div>` : ''}
-                            ${data.Role ? `<div><strong>Role:</strong> ${data.Role}</div>` : ''}
-                            ${data.Status ? `<div><strong>Status:</strong> ${data.Status}</div>` : ''}
-                            ${data.Work_Location_Code ? `<div><strong>Location:</strong> ${data.Work_Location_Code}</div>` : ''}
-                        `;
-                    }
-                    
-                    html += `
-                            </div>
-                        </div>
-                    `;
-                });
-                
-                html += `</div></div>`;
             }
             
             // Add suggestions section if available
@@ -1722,11 +3010,10 @@ def create_openai_app() -> Flask:
                 `;
                 
                 data.suggestions.forEach(suggestion => {
-                    const cleanSuggestion = suggestion.replace('Try: ', '');
                     html += `
                         <button style="background: #4caf50; color: white; border: none; padding: 8px 16px; border-radius: 20px; cursor: pointer; font-size: 14px;" 
-                                onclick="document.getElementById('searchInput').value='${cleanSuggestion.replace(/'/g, '\\'')}'; searchData();">
-                            ${cleanSuggestion}
+                                data-query="${escapeHtml(suggestion)}">
+                            ${escapeHtml(suggestion)}
                         </button>
                     `;
                 });
@@ -1739,7 +3026,7 @@ def create_openai_app() -> Flask:
                 html += `
                     <div style="background: #fafafa; border: 1px solid #bdbdbd; border-radius: 8px; padding: 15px; margin: 20px 0;">
                         <div style="font-style: italic; color: #555; text-align: center;">
-                            📋 ${data.comprehensive_summary}
+                            📋 ${escapeHtml(data.comprehensive_summary)}
                         </div>
                     </div>
                 `;
@@ -1750,7 +3037,7 @@ def create_openai_app() -> Flask:
                 html += `
                     <div class="sql-display" style="margin-top: 30px;">
                         <div class="label">📝 Generated SQL Query:</div>
-                        <div>${data.sql}</div>
+                        <div>${escapeHtml(data.sql)}</div>
                     </div>
                 `;
             }
@@ -1760,12 +3047,139 @@ def create_openai_app() -> Flask:
                 html += `
                     <div class="sql-display" style="border-left-color: #ffc107; margin-top: 15px;">
                         <div class="label" style="color: #856404;">⚠️ Attempted SQL (failed):</div>
-                        <div>${data.attempted_sql}</div>
+                        <div>${escapeHtml(data.attempted_sql)}</div>
                     </div>
                 `;
             }
             
             resultsContent.innerHTML = html;
+            
+            // Result rows are built as DOM nodes so database values are only ever text
+            if (results.length > 0) {
+                renderResultWindow(document.getElementById('resultCards'), results);
+            }
+            
+            resultsContent.querySelectorAll('button[data-query]').forEach(button => {
+                button.addEventListener('click', () => setQuery(button.dataset.query));
+            });
+        }
+        
+        // Result cards have a fixed height so only the rows in view need to be in the DOM
+        const RESULT_ROW_HEIGHT = 210;
+        const RESULT_CARD_GAP = 12;
+        const RESULT_OVERSCAN = 3;
+        
+        function renderResultWindow(viewport, results) {
+            const spacer = createElement('div', `position: relative; height: ${results.length * RESULT_ROW_HEIGHT - RESULT_CARD_GAP}px;`);
+            const rendered = new Map();
+            let framePending = false;
+            
+            function update() {
+                framePending = false;
+                const first = Math.max(0, Math.floor(viewport.scrollTop / RESULT_ROW_HEIGHT) - RESULT_OVERSCAN);
+                const last = Math.min(results.length,
+                    Math.ceil((viewport.scrollTop + viewport.clientHeight) / RESULT_ROW_HEIGHT) + RESULT_OVERSCAN);
+                
+                for (const [index, card] of rendered) {
+                    if (index < first || index >= last) {
+                        card.remove();
+                        rendered.delete(index);
+                    }
+                }
+                
+                const cards = document.createDocumentFragment();
+                for (let index = first; index < last; index++) {
+                    if (rendered.has(index)) continue;
+                    const card = buildResultCard(results[index], index);
+                    card.style.position = 'absolute';
+                    card.style.top = `${index * RESULT_ROW_HEIGHT}px`;
+                    card.style.left = '0';
+                    card.style.right = '0';
+                    card.style.height = `${RESULT_ROW_HEIGHT - RESULT_CARD_GAP}px`;
+                    card.style.boxSizing = 'border-box';
+                    card.style.overflow = 'hidden';
+                    rendered.set(index, card);
+                    cards.appendChild(card);
+                }
+                spacer.appendChild(cards);
+            }
+            
+            viewport.replaceChildren(spacer);
+            viewport.onscroll = () => {
+                if (!framePending) {
+                    framePending = true;
+                    requestAnimationFrame(update);
+                }
+            };
+            update();
+        }
+        
+        function escapeHtml(value) {
+            const entities = { '&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;' };
+            return String(value ?? '').replace(/[&<>"']/g, ch => entities[ch]);
+        }
+        
+        function createElement(tag, style, text) {
+            const element = document.createElement(tag);
+            if (style) element.style.cssText = style;
+            if (text !== undefined) element.textContent = text;
+            return element;
+        }
+        
+        function buildResultCard(result, index) {
+            const data = result.data || result;
+            const isDevice = result.type === 'device' || data.Asset_Number;
+            const isAppAccess = data.App || data.Identifier;
+            
+            // Determine result type and icon
+            let icon = '👤';
+            let type = 'User';
+            if (isDevice) {
+                icon = '💻';
+                type = 'Device';
+            } else if (isAppAccess) {
+                icon = '🔑';
+                type = 'App Access';
+            }
+            
+            const fields = [];
+            if (isDevice) {
+                fields.push(['Asset', data.Asset_Number || 'N/A']);
+                fields.push(['Device', `${data.Manufacturer || 'N/A'} ${data.Model_Name || 'N/A'} (${data.Device_Type || 'N/A'})`]);
+                fields.push(['Status', data.Device_Status || 'N/A']);
+                fields.push(['Assigned to', data.Assigned_User_s_Email || 'Unassigned']);
+                if (data.City || data.Region) fields.push(['Location', `${data.City || 'N/A'}, ${data.Region || 'N/A'}`]);
+            } else if (isAppAccess) {
+                fields.push(['Application', data.App || 'N/A']);
+                fields.push(['User', `${data.First_Name || ''} ${data.Last_Name || ''} (${data.Email || 'N/A'})`]);
+                fields.push(['Access ID', data.ID || data.Identifier || 'N/A']);
+                fields.push(['Role', data.Role_s || data.Role || 'N/A']);
+                fields.push(['Status', data.Account_Status || data.Status || 'N/A']);
+                if (data.Department_s) fields.push(['Department', data.Department_s]);
+            } else {
+                fields.push(['Name', `${data.First_Name || ''} ${data.Last_Name || ''}`]);
+                fields.push(['Email', data.Email || 'N/A']);
+                if (data.User_ID) fields.push(['User ID', data.User_ID]);
+                if (data.Role) fields.push(['Role', data.Role]);
+                if (data.Status) fields.push(['Status', data.Status]);
+                if (data.Work_Location_Code) fields.push(['Location', data.Work_Location_Code]);
+            }
+            
+            const card = createElement('div', 'background: white; border: 1px solid #e9ecef; border-radius: 6px; padding: 12px;');
+            const header = createElement('div', 'display: flex; align-items: center; margin-bottom: 8px;');
+            header.append(createElement('span', 'font-size: 16px; margin-right: 8px;', icon),
+                          createElement('strong', 'color: #212529;', `${type} #${index + 1}`));
+            
+            const body = createElement('div', 'color: #6c757d; line-height: 1.6;');
+            fields.forEach(([label, value]) => {
+                const row = createElement('div', 'white-space: nowrap; overflow: hidden; text-overflow: ellipsis;');
+                row.title = `${label}: ${value}`;
+                row.append(createElement('strong', '', `${label}:`), ` ${value}`);
+                body.appendChild(row);
+            });
+            
+            card.append(header, body);
+            return card;
         }
         
         // Auto-focus search input
@@ -1773,24 +3187,84 @@ def create_openai_app() -> Flask:
     </script>
 </body>
 </html>
-        '''
+'''
+_INDEX_HTML = INDEX_HTML.encode('utf-8')
+_INDEX_ETAG = hashlib.sha256(_INDEX_HTML).hexdigest()[:16]
+_INDEX_HTML_GZIP = gzip.compress(_INDEX_HTML, compresslevel=9)
+
+
+def create_openai_app() -> Flask:
+    """Create Flask app with OpenAI NLP capabilities."""
+    
+    app = Flask(__name__)
+    if orjson is not None:
+        app.json = OrjsonProvider(app)
+    
+    try:
+        nlp = JosysOpenAINLP()
+    except Exception as e:
+        print(f"❌ Failed to initialize OpenAI NLP: {e}")
+        return None
+    
+    @app.route('/')
+    def index():
+        if 'gzip' in request.accept_encodings:
+            response = Response(_INDEX_HTML_GZIP, mimetype='text/html')
+            response.headers['Content-Encoding'] = 'gzip'
+            response.set_etag(f"{_INDEX_ETAG}-gz")
+        else:
+            response = Response(_INDEX_HTML, mimetype='text/html')
+            response.set_etag(_INDEX_ETAG)
+        response.vary.add('Accept-Encoding')
+        response.headers['Cache-Control'] = 'public, max-age=300'
+        return response.make_conditional(request)
+    
+    def will_compress(response) -> bool:
+        """Whether compress_json gzips this response; streamed responses are left alone."""
+        return (response.mimetype == 'application/json' and not response.is_streamed
+                and 'Content-Encoding' not in response.headers
+                and 'gzip' in request.accept_encodings
+                and len(response.get_data()) >= COMPRESS_MIN_SIZE)
+    
+    @app.after_request
+    def compress_json(response):
+        """Gzip JSON API responses."""
+        if not will_compress(response):
+            return response
+        body = response.get_data()
+        response.set_data(gzip.compress(body, compresslevel=COMPRESS_LEVEL))
+        response.headers['Content-Encoding'] = 'gzip'
+        response.vary.add('Accept-Encoding')
+        return response
     
-    @app.route('/api/nlp-search', methods=['POST'])
+    @app.route('/api/nlp-search', methods=['GET', 'POST'])
     def api_nlp_search():
+        """Answer a question. GET answers (?q=...) carry an ETag and may be cached by the browser."""
         try:
-            data = request.get_json()
-            question = data.get('question', '').strip()
-            search_type = data.get('type', 'combined')
-            
-            if not question:
-                return jsonify({'error': 'Question is required', 'status': 'error'}), 400
+            if request.method == 'GET':
+                question = request.args.get('q', '').strip()
+            else:
+                data = request.get_json(silent=True) or {}
+                question = data.get('question', '').strip()
             
-            if len(question) < 3:
-                return jsonify({'error': 'Question too short', 'status': 'error'}), 400
+            error = _question_error(question)
+            if error:
+                return jsonify({'error': error, 'status': 'error'}), 400
             
             # Use combined search (NL2SQL with keyword fallback)
+            nlp.timings.start()
             result = nlp.combined_nlp_search(question)
-            return jsonify(result)
+            with nlp.timings.stage('serialize'):
+                response = jsonify(result)
+            response.headers['Server-Timing'] = nlp.timings.server_timing()
+            if request.method == 'GET' and result.get('status') == 'success':
+                response.headers['Cache-Control'] = f'private, max-age={SEARCH_CACHE_MAX_AGE}'
+                # The gzipped body compress_json sends is a different representation, with its own tag
+                etag = _result_etag(result)
+                response.set_etag(f"{etag}-gz" if will_compress(response) else etag)
+                response.vary.add('Accept-Encoding')
+                response = response.make_conditional(request)
+            return response
             
         except Exception as e:
             return jsonify({
@@ -1799,17 +3273,92 @@ def create_openai_app() -> Flask:
                 'method': 'api_error'
             }), 500
     
+    @app.route('/api/nlp-search/stream', methods=['POST'])
+    def api_nlp_search_stream():
+        """Server-sent events: 'results' with the rows as soon as the SQL has run, then 'complete'."""
+        try:
+            data = request.get_json(silent=True) or {}
+            question = data.get('question', '').strip()
+        except Exception as e:
+            return jsonify({
+                'error': str(e),
+                'status': 'error',
+                'method': 'api_error'
+            }), 500
+        
+        error = _question_error(question)
+        if error:
+            return jsonify({'error': error, 'status': 'error'}), 400
+        
+        # The search runs on its own thread so early results can be sent while insights are built
+        events = queue.Queue()
+        
+        def search():
+            try:
+                result = nlp.combined_nlp_search(question, on_results=lambda partial: events.put(('results', partial)))
+                events.put(('complete', result))
+            except Exception as e:
+                events.put(('error', {'error': str(e), 'status': 'error', 'method': 'api_error'}))
+        
+        threading.Thread(target=search, daemon=True).start()
+        
+        def stream():
+            while True:
+                event, payload = events.get()
+                yield f"event: {event}\ndata: {_dumps_json(payload)}\n\n"
+                if event != 'results':
+                    break
+        
+        return Response(stream(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
+    
     @app.route('/api/status')
     def api_status():
         return jsonify({
             'status': 'running',
             'openai_connected': bool(nlp.api_key),
             'database_connected': os.path.exists(nlp.db_path),
-            'cache_size': len(nlp.query_cache)
+            'cache_size': len(nlp.query_cache),
+            'cache_hits': nlp.query_cache.hits,
+            'cache_misses': nlp.query_cache.misses,
+            'cache_hit_rate': round(nlp.query_cache.hit_rate, 3),
+            'plan_cache_size': len(nlp.plan_cache),
+            'completion_cache_size': len(nlp.completion_cache),
+            'semantic_cache_size': len(nlp.semantic_cache)
         })
     
+    @app.route('/api/cache/clear', methods=['POST'])
+    def api_cache_clear():
+        nlp.clear_caches()
+        return jsonify({'status': 'cleared'})
+    
     return app
 
+def serve(app: Flask, host: str = '0.0.0.0', port: int = 5000):
+    """Serve the app with gunicorn when it is installed, else the Flask server."""
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        print("💡 gunicorn not installed - using the Flask development server")
+        app.run(host=host, port=port, debug=False, threaded=True)
+        return
+    
+    class PreloadedApplication(BaseApplication):
+        """Hand gunicorn the app built here; workers inherit it when they fork."""
+        
+        def load_config(self):
+            self.cfg.set('bind', f"{host}:{port}")
+            self.cfg.set('workers', WEB_WORKERS)
+            self.cfg.set('worker_class', 'gthread')
+            self.cfg.set('threads', WEB_THREADS)
+            self.cfg.set('timeout', WEB_TIMEOUT)
+            self.cfg.set('keepalive', 5)
+        
+        def load(self):
+            return app
+    
+    print(f"🚀 gunicorn: {WEB_WORKERS} workers x {WEB_THREADS} threads")
+    PreloadedApplication().run()
+
 def main():
     """Start the OpenAI NLP web interface."""
     print("🤖 Starting Josys OpenAI NLP Web Interface")
@@ -1822,7 +3371,7 @@ def main():
             return
         
         print("\n🌐 OpenAI NLP Interface Features:")
-        print("   🧠 Natural Language to SQL with GPT-3.5")
+        print("   🧠 Natural Language to SQL with GPT-4o mini")
         print("   🔍 Smart keyword fallback search")
         print("   🎯 Combined intelligent search")
         print("   💾 Query caching for performance")
@@ -1833,7 +3382,7 @@ def main():
         print(f"⚠️  Press Ctrl+C to stop")
         print("=" * 50)
         
-        app.run(host='0.0.0.0', port=5000, debug=False, threaded=True)
+        serve(app)
         
     except Exception as e:
         print(f"❌ Failed to start: {e}")
@@ -4,8 +4,6 @@ Simple startup script for the Josys NLP Web Interface
 """
 
 import os
-import sys
-import subprocess
 
 def main():
     print("🚀 Starting Josys NLP Web Interface Service")
@@ -30,8 +28,9 @@ def main():
     print("\n🤖 Starting OpenAI NLP interface...")
     
     try:
-        # Start the NLP interface
-        subprocess.run([sys.executable, 'nlp_openai_interface.py'])
+        # Start the NLP interface in this process rather than a second interpreter
+        from nlp_openai_interface import main as nlp_main
+        nlp_main()
     except KeyboardInterrupt:
         print("\n👋 NLP service stopped.")
     except Exception as e:
@@ -0,0 +1,78 @@
+"""Shared fixtures: the interface runs against copies of the repo's data with a fake OpenAI client."""
+
+import hashlib
+import json
+import shutil
+import sys
+import types
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+import nlp_openai_interface  # noqa: E402
+
+
+class FakeOpenAI:
+    """Answers every chat completion with ``sql`` and embeds text deterministically."""
+
+    sql = "SELECT * FROM devices LIMIT 5"
+
+    def __init__(self, *args, **kwargs):
+        self.chat = types.SimpleNamespace(completions=types.SimpleNamespace(create=self._complete))
+        self.embeddings = types.SimpleNamespace(create=self._embed)
+
+    def _complete(self, **request):
+        message = types.SimpleNamespace(content=json.dumps({'sql': self.sql}))
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)])
+
+    def _embed(self, model, input):
+        texts = input if isinstance(input, list) else [input]
+        data = []
+        for text in texts:
+            seed = int(hashlib.md5(text.lower().encode('utf-8')).hexdigest()[:8], 16)
+            data.append(types.SimpleNamespace(embedding=np.random.default_rng(seed).normal(size=64).tolist()))
+        return types.SimpleNamespace(data=data)
+
+
+class FakeAsyncOpenAI:
+    """Async counterpart used for the batched warm-up embeddings."""
+
+    def __init__(self, *args, **kwargs):
+        self.embeddings = types.SimpleNamespace(create=self._embed)
+
+    async def _embed(self, model, input):
+        return FakeOpenAI()._embed(model, input)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """A working directory holding a copy of josys_data.db, with the caches written beside it."""
+    shutil.copy(REPO_ROOT / 'josys_data.db', tmp_path / 'josys_data.db')
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(nlp_openai_interface, 'SCHEMA_CACHE_PATH', str(tmp_path / 'schema.json'))
+    return tmp_path
+
+
+@pytest.fixture
+def make_nlp(workdir, monkeypatch):
+    """Factory for interfaces sharing one database and cache file, like gunicorn workers."""
+    monkeypatch.setenv('OPENAI_API_KEY', 'sk-test')
+    monkeypatch.setattr(nlp_openai_interface.openai, 'OpenAI', FakeOpenAI)
+    monkeypatch.setattr(nlp_openai_interface.openai, 'AsyncOpenAI', FakeAsyncOpenAI)
+
+    def make():
+        nlp = nlp_openai_interface.JosysOpenAINLP('josys_data.db')
+        nlp._warm_thread.join()
+        return nlp
+
+    return make
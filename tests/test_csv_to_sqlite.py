@@ -0,0 +1,86 @@
+import os
+import shutil
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+import csv_to_sqlite
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+CSV_FILES = ('josys-devices.csv', 'josys-provisions.csv', 'josys-app-portfolio.csv')
+
+
+@pytest.fixture(params=['read_csv', 'open_csv'])
+def reader_path(request, monkeypatch):
+    """Run a test against both the in-memory and the streaming Arrow reader."""
+    if request.param == 'open_csv':
+        monkeypatch.setattr(csv_to_sqlite, 'PARALLEL_READ_MAX_BYTES', 0)
+        monkeypatch.setattr(csv_to_sqlite, 'CSV_BLOCK_SIZE', 1 << 14)
+    return request.param
+
+
+def write_csv(path, bad_line):
+    """Write a 3-column CSV of 5000 rows with row 4000 replaced by ``bad_line``."""
+    lines = ['a,b,c'] + [f'{i},x{i},y{i}' for i in range(5000)]
+    lines[4000] = bad_line
+    path.write_text('\n'.join(lines) + '\n')
+
+
+def load_rows(csv_path):
+    batches = csv_to_sqlite.stream_csv_batches(str(csv_path), ['a', 'b', 'c'])
+    return [row for batch in batches for row in zip(*(column.to_pylist() for column in batch.columns))]
+
+
+def test_short_rows_are_padded(tmp_path, reader_path):
+    csv_path = tmp_path / 'ragged.csv'
+    write_csv(csv_path, '3999,short')
+
+    rows = load_rows(csv_path)
+
+    assert len(rows) == 5000
+    assert rows[3998] == ('3998', 'x3998', 'y3998')
+    assert rows[3999] == ('3999', 'short', '')
+    assert rows[-1] == ('4999', 'x4999', 'y4999')
+
+
+def test_long_rows_are_rejected(tmp_path, reader_path):
+    csv_path = tmp_path / 'ragged.csv'
+    write_csv(csv_path, '3999,x,y,z')
+
+    with pytest.raises(ValueError, match='line 4001: expected 3 fields, saw 4'):
+        load_rows(csv_path)
+
+
+def test_build_is_complete_and_current(tmp_path, monkeypatch):
+    for name in CSV_FILES:
+        shutil.copy(REPO_ROOT / name, tmp_path / name)
+    monkeypatch.chdir(tmp_path)
+
+    csv_to_sqlite.setup_database()
+
+    conn = sqlite3.connect('josys_data.db')
+    names = {name for (name,) in conn.execute("SELECT name FROM sqlite_master")}
+    assert {'idx_devices_email', 'idx_app_portfolio_aws_admins', 'sqlite_stat1', 'build_info'} <= names
+    assert conn.execute("SELECT value FROM build_info WHERE key = 'content_hash'").fetchone()
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == 'delete'
+    conn.close()
+    assert csv_to_sqlite.database_is_current('josys_data.db', CSV_FILES)
+
+    # A newer CSV makes the database stale again
+    future = os.path.getmtime('josys_data.db') + 10
+    os.utime(CSV_FILES[0], (future, future))
+    assert not csv_to_sqlite.database_is_current('josys_data.db', CSV_FILES)
+
+
+def test_database_from_an_older_build_is_not_current(tmp_path):
+    db_path = tmp_path / 'old.db'
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE devices (Asset_Number TEXT)")
+    conn.close()
+    csv_path = tmp_path / 'devices.csv'
+    csv_path.write_text('Asset_Number\n')
+    os.utime(csv_path, (0, 0))
+
+    assert not csv_to_sqlite.database_is_current(str(db_path), [str(csv_path)])
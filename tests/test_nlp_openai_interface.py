@@ -0,0 +1,130 @@
+import os
+import shutil
+import sqlite3
+
+import numpy as np
+import pytest
+
+import nlp_openai_interface
+from nlp_openai_interface import (MAX_QUESTION_LENGTH, PersistentQueryCache, SemanticQueryCache,
+                                  _question_error, _result_etag)
+
+
+@pytest.mark.parametrize('question, error', [
+    ('', 'Question is required'),
+    ('hi', 'Question too short'),
+    ('x' * (MAX_QUESTION_LENGTH + 1), f'Question too long (maximum {MAX_QUESTION_LENGTH} characters)'),
+    ('?!?!', 'Question must contain words'),
+    ('P0001', None),
+    ('show macbook laptops', None),
+])
+def test_question_error(question, error):
+    assert _question_error(question) == error
+
+
+def test_result_etag_ignores_timings_and_cache_flags():
+    result = {'question': 'show macbooks', 'results': [{'Asset_Number': 'A1'}], 'count': 1,
+              'status': 'success', 'execution_time': 0.25, 'cached': False}
+    repeat = {**result, 'execution_time': 0.01, 'cached': True, 'matched_question': 'list macbooks',
+              'similarity': 0.97}
+
+    assert _result_etag(repeat) == _result_etag(result)
+    assert _result_etag({**result, 'count': 2}) != _result_etag(result)
+
+
+def test_persistent_cache_is_shared_between_workers(workdir):
+    first = PersistentQueryCache()
+    second = PersistentQueryCache()
+
+    first.put('question', {'count': 3})
+    assert second.get('question') == {'count': 3}
+
+    generation = second.generation()
+    first.bump_generation()
+    assert second.generation() == generation + 1
+
+
+def test_bind_data_version_resets_the_cache_once(workdir):
+    cache = PersistentQueryCache()
+    cache.bind_data_version('v1')
+    cache.put('question', {'count': 3})
+
+    assert not PersistentQueryCache().bind_data_version('v1')
+    assert PersistentQueryCache().bind_data_version('v2')
+    assert not PersistentQueryCache().bind_data_version('v2')
+    assert PersistentQueryCache().get('question') is None
+
+
+def test_semantic_cache_entries_reach_other_workers(workdir):
+    vector = np.ones(8, dtype=np.float32) / np.sqrt(8)
+    first = SemanticQueryCache()
+    first.add(vector, {'question': 'show macbooks', 'count': 1})
+
+    second = SemanticQueryCache()
+    hit = second.lookup(vector)
+    assert hit['matched_question'] == 'show macbooks'
+
+    first.clear()
+    second.reload()
+    assert second.lookup(vector) is None
+
+
+def test_plan_key_templates_person_names(make_nlp):
+    nlp = make_nlp()
+    name = sorted(nlp.person_names)[0]
+
+    template, names = nlp._question_plan_key(f"Which apps can {name.title()} use?")
+
+    assert template == "which apps can {name} use?"
+    assert names == (name,)
+    assert nlp._question_plan_key("which apps can everyone use?") is None
+
+
+def test_clear_caches_reaches_other_workers(make_nlp):
+    first, second = make_nlp(), make_nlp()
+    question = "what hardware is registered"
+    first.natural_language_to_sql(question)
+    assert second.natural_language_to_sql(question)['cached']
+
+    first.clear_caches()
+    second._cache_checked_at = 0
+    second._sync_caches()
+
+    assert len(second.query_cache) == 0
+    assert not second.natural_language_to_sql(question).get('cached')
+
+
+def test_rebuilt_database_reloads_every_worker(make_nlp, workdir):
+    first, second = make_nlp(), make_nlp()
+    shutil.copy('josys_data.db', 'rebuilt.db')
+    conn = sqlite3.connect('rebuilt.db')
+    with conn:
+        conn.execute("UPDATE provisions SET First_Name = 'Zorblax' WHERE rowid = 1")
+        conn.execute("UPDATE build_info SET value = 'rebuilt' WHERE key = 'content_hash'")
+    conn.close()
+    os.replace('rebuilt.db', 'josys_data.db')
+
+    for nlp in (first, second):
+        nlp._cache_checked_at = 0
+        nlp._sync_caches()
+        assert nlp.data_version == 'rebuilt'
+        assert 'zorblax' in nlp.person_names
+
+
+def test_gzipped_answer_has_its_own_etag(make_nlp):
+    # make_nlp supplies the API key and fake OpenAI client the app's interface is built with
+    client = nlp_openai_interface.create_openai_app().test_client()
+    query = {'q': 'show all devices registered'}
+
+    gzipped = client.get('/api/nlp-search', query_string=query, headers={'Accept-Encoding': 'gzip'})
+    plain = client.get('/api/nlp-search', query_string=query, headers={'Accept-Encoding': 'identity'})
+
+    assert gzipped.headers['Content-Encoding'] == 'gzip'
+    assert gzipped.headers['ETag'] == plain.headers['ETag'][:-1] + '-gz"'
+
+    repeat = client.get('/api/nlp-search', query_string=query,
+                        headers={'Accept-Encoding': 'gzip', 'If-None-Match': gzipped.headers['ETag']})
+    assert repeat.status_code == 304
+    mismatched = client.get('/api/nlp-search', query_string=query,
+                            headers={'Accept-Encoding': 'identity', 'If-None-Match': gzipped.headers['ETag']})
+    assert mismatched.status_code == 200